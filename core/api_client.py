@@ -2,11 +2,18 @@ import requests
 import json
 import os
 import base64
+import tempfile
 from core.config import cfg
+from core.http_pool import HttpSessionPool
+from core.ref_cache import DataUriCache
+from core.ref_preprocess import ref_preprocessor
+from core.stream_body import StreamingJsonBody
+from core.rate_limit import rate_limiter, is_throttle_response, parse_retry_after
 
 class ApiClient:
     def __init__(self):
-        pass
+        self.http = HttpSessionPool()
+        self.ref_cache = DataUriCache()
 
     def get_headers(self):
         return {
@@ -15,41 +22,106 @@ class ApiClient:
         }
 
     def _convert_image_to_data_uri(self, image_path):
-        """Convert local image file to data URI for API submission"""
+        """Convert local image file to data URI for API submission (cached)"""
         try:
             if os.path.isfile(image_path):
-                with open(image_path, "rb") as f:
-                    b64_string = base64.b64encode(f.read()).decode('utf-8')
-                    ext = os.path.splitext(image_path)[1].lower().replace('.', '')
-                    if ext == 'jpg': ext = 'jpeg'
-                    return f"data:image/{ext};base64,{b64_string}"
+                return self.ref_cache.get(image_path, self._encode_data_uri)
         except Exception as e:
             print(f"Error converting image to data URI: {e}")
         return None
 
+    def _encode_data_uri(self, image_path):
+        with open(image_path, "rb") as f:
+            b64_string = base64.b64encode(f.read()).decode('utf-8')
+        ext = os.path.splitext(image_path)[1].lower().replace('.', '')
+        if ext == 'jpg': ext = 'jpeg'
+        return f"data:image/{ext};base64,{b64_string}"
+
     def submit_task(self, prompt, model, aspect_ratio="auto", image_size="1K", ref_image_urls=None, variants=1):
         """Submit task to appropriate API based on model"""
-        # Convert local file paths to data URIs for API submission
+        stream_refs = False
         if ref_image_urls:
-            converted_urls = []
-            for url in ref_image_urls:
-                if os.path.isfile(url):  # It's a local file path
-                    data_uri = self._convert_image_to_data_uri(url)
-                    if data_uri:
-                        converted_urls.append(data_uri)
-                else:  # It's already a URL or data URI
-                    converted_urls.append(url)
-            ref_image_urls = converted_urls if converted_urls else None
+            # Downscaled/re-encoded copies when preprocessing is enabled
+            ref_image_urls = [ref_preprocessor.resolve(url, model) if os.path.isfile(url) else url
+                              for url in ref_image_urls]
+            stream_refs = self._should_stream(ref_image_urls)
+            if not stream_refs:
+                # Convert local file paths to data URIs for API submission
+                converted_urls = []
+                for url in ref_image_urls:
+                    if os.path.isfile(url):  # It's a local file path
+                        data_uri = self._convert_image_to_data_uri(url)
+                        if data_uri:
+                            converted_urls.append(data_uri)
+                    else:  # It's already a URL or data URI
+                        converted_urls.append(url)
+                ref_image_urls = converted_urls if converted_urls else None
         
         # Determine which API to use
         if model.startswith("nano-banana"):
-            return self._submit_nano_banana(prompt, model, aspect_ratio, image_size, ref_image_urls)
+            return self._submit_nano_banana(prompt, model, aspect_ratio, image_size, ref_image_urls, stream_refs)
         elif model in ["gpt-image-1.5", "sora-image"]:
-            return self._submit_gpt_image(prompt, model, aspect_ratio, ref_image_urls, variants)
+            return self._submit_gpt_image(prompt, model, aspect_ratio, ref_image_urls, variants, stream_refs)
         else:
             return {"code": -1, "msg": f"Unknown model: {model}"}
 
-    def _submit_nano_banana(self, prompt, model, aspect_ratio, image_size, ref_image_urls):
+    def _should_stream(self, ref_paths):
+        """Stream the body instead of building it in memory for large reference sets"""
+        if not cfg.get("stream_upload_enabled", True):
+            return False
+        total = sum(os.path.getsize(p) for p in ref_paths if os.path.isfile(p))
+        return total > 0 and total >= cfg.get("stream_upload_threshold_mb", 4) * 1024 * 1024
+
+    def _post_draw(self, url, payload, ref_image_urls, stream_refs):
+        """POST a draw request, either as a JSON dict or a streamed body"""
+        try:
+            if stream_refs:
+                body = StreamingJsonBody(payload, "urls", ref_image_urls)
+                response = self.http.post(url, headers=self.get_headers(), data=body)
+            else:
+                if ref_image_urls:
+                    payload["urls"] = ref_image_urls
+                response = self.http.post(url, headers=self.get_headers(), json=payload)
+            result = self._parse_response(response)
+            if result.get("code") == 0:
+                rate_limiter.on_success()
+            return result
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            return {"code": -1, "msg": str(e), "network": True}
+        except (requests.exceptions.RequestException, OSError, ValueError) as e:
+            return {"code": -1, "msg": str(e)}
+
+    def _parse_response(self, response):
+        """JSON body of an API response, with throttling and server errors flagged.
+
+        Throttled results carry "throttled": True and the pause in
+        "retry_after"; the shared rate limiter has already been told.
+        Other failures carry "http_status"; only connection errors and
+        timeouts (caught by the callers) are marked "network".
+        """
+        status = response.status_code
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        msg = body.get("msg") if isinstance(body, dict) else None
+        if is_throttle_response(status, body):
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            pause = rate_limiter.on_throttle(retry_after)
+            return {"code": -1, "msg": msg or f"Rate limited (HTTP {status})", "throttled": True,
+                    "retry_after": pause, "http_status": status}
+        if status >= 500:
+            return {"code": -1, "msg": msg or f"Server error (HTTP {status})", "http_status": status}
+        if status >= 400:
+            # Bad key, invalid parameters, unknown task...: rejected, not worth a quick retry
+            code = body.get("code") if isinstance(body, dict) else None
+            return {"code": -1 if code in (0, None) else code,
+                    "msg": msg or f"HTTP {status} {response.reason or ''}".strip(), "http_status": status}
+        if not isinstance(body, dict):
+            raise ValueError(f"Unparseable API response (HTTP {status})")
+        return body
+
+    def _submit_nano_banana(self, prompt, model, aspect_ratio, image_size, ref_image_urls, stream_refs=False):
         """Submit to Nano Banana API"""
         url = f"{cfg.get('api_base_url').rstrip('/')}/v1/draw/nano-banana"
         
@@ -62,17 +134,9 @@ class ApiClient:
             "shutProgress": False
         }
 
-        if ref_image_urls:
-            payload["urls"] = ref_image_urls
-
-        try:
-            response = requests.post(url, headers=self.get_headers(), json=payload, timeout=30)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            return {"code": -1, "msg": str(e)}
+        return self._post_draw(url, payload, ref_image_urls, stream_refs)
 
-    def _submit_gpt_image(self, prompt, model, size, ref_image_urls, variants):
+    def _submit_gpt_image(self, prompt, model, size, ref_image_urls, variants, stream_refs=False):
         """Submit to GPT Image / Sora API"""
         url = f"{cfg.get('api_base_url').rstrip('/')}/v1/draw/completions"
         
@@ -85,15 +149,7 @@ class ApiClient:
             "shutProgress": False
         }
 
-        if ref_image_urls:
-            payload["urls"] = ref_image_urls
-
-        try:
-            response = requests.post(url, headers=self.get_headers(), json=payload, timeout=30)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            return {"code": -1, "msg": str(e)}
+        return self._post_draw(url, payload, ref_image_urls, stream_refs)
 
     def get_task_result(self, task_id):
         """Get task result - works for both APIs"""
@@ -101,10 +157,64 @@ class ApiClient:
         payload = {"id": task_id}
 
         try:
-            response = requests.post(url, headers=self.get_headers(), json=payload, timeout=30)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            response = self.http.post(url, headers=self.get_headers(), json=payload)
+            return self._parse_response(response)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            return {"code": -1, "msg": str(e), "network": True}
+        except (requests.exceptions.RequestException, ValueError) as e:
             return {"code": -1, "msg": str(e)}
 
+    def download_result(self, url, output_dir, filename):
+        """Stream a generated image to disk and return the saved path.
+
+        Chunks are written to a temp file in output_dir and only moved into
+        place once the download is complete, so memory stays bounded and a
+        failed download never leaves a truncated image behind.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        chunk_size = cfg.get("download_chunk_size", 256 * 1024)
+        read_timeout = cfg.get("download_read_timeout", 120)
+        fd, tmp_path = tempfile.mkstemp(suffix=".part", dir=output_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                with self.http.get(url, read_timeout=read_timeout, stream=True) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(chunk_size):
+                        f.write(chunk)
+            filepath = self._claim_path(output_dir, filename)
+            os.replace(tmp_path, filepath)
+            return filepath
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _claim_path(self, output_dir, filename):
+        """Reserve a free file name, adding (2), (3)... if it is already taken"""
+        stem, ext = os.path.splitext(filename)
+        candidate = filename
+        counter = 1
+        while True:
+            path = os.path.join(output_dir, candidate)
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return path
+            except FileExistsError:
+                counter += 1
+                candidate = f"{stem} ({counter}){ext}"
+
+    def get_pool_stats(self):
+        """Connection pool hit/miss counters"""
+        return self.http.get_stats()
+
+    def get_rate_limit_stats(self):
+        """Current in-flight limit, throttle events and accepted submissions per minute"""
+        return rate_limiter.get_stats()
+
+    def get_ref_cache_stats(self):
+        """Reference data URI cache hit/miss and bytes-saved counters"""
+        return self.ref_cache.get_stats()
+
 api = ApiClient()
@@ -0,0 +1,268 @@
+"""
+Batch - Headless bulk generation from a JSONL file of job specs
+
+    python -m core.batch jobs.jsonl [--report report.jsonl] [--concurrency N] [--retries N]
+
+Each line of the jobs file is one spec:
+
+    {"prompt": "...", "model": "nano-banana", "ratio": "16:9", "size": "2K",
+     "refs": ["ref.png"], "variants": 1, "repeat": 4}
+
+Only "prompt" is required. Jobs run on the same TaskEngine, ApiClient and
+history store as the GUI (bulk priority, shared rate limiter), but nothing
+here imports Qt. Specs are read lazily and only a bounded window of jobs is
+handed to the engine at a time, so very large files stay cheap. Every
+finished job is appended to the report as one JSON line, and a status line
+shows throughput and ETA while the run is in progress.
+"""
+import argparse
+import heapq
+import json
+import os
+import queue
+import sys
+import time
+
+from core.config import cfg
+from core.engine import Job, TaskEngine
+from core.history_manager import history_mgr
+from core.rate_limit import AimdController, rate_limiter
+from core.retry_policy import retry_policy, DOWNLOAD
+from core.scheduler import JobScheduler, PRIORITY_BULK
+
+DEFAULT_MODEL = "nano-banana"
+# Jobs handed to the engine per allowed concurrent job (the rest stay unread)
+WINDOW_FACTOR = 2
+# Seconds between status lines when stdout is not a terminal
+STATUS_INTERVAL = 10.0
+
+
+class BatchSpec:
+    """One job spec line, with defaults applied"""
+
+    def __init__(self, line_no, data):
+        if not isinstance(data, dict) or not str(data.get("prompt") or "").strip():
+            raise ValueError("spec needs a non-empty \"prompt\"")
+        self.line_no = line_no
+        self.prompt = data["prompt"]
+        self.model = data.get("model") or DEFAULT_MODEL
+        self.ratio = data.get("ratio") or "auto"
+        self.size = data.get("size") or "1K"
+        self.refs = list(data.get("refs") or [])
+        self.variants = int(data.get("variants", 1))
+        self.repeat = max(1, int(data.get("repeat", 1)))
+        missing = [path for path in self.refs if "://" not in path and not path.startswith("data:")
+                   and not os.path.isfile(path)]
+        if missing:
+            raise ValueError(f"reference image not found: {missing[0]}")
+
+
+def read_specs(path):
+    """Yield (line number, BatchSpec or error message) for each non-blank line"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                yield line_no, BatchSpec(line_no, json.loads(line))
+            except (ValueError, TypeError) as e:
+                yield line_no, str(e)
+
+
+def count_jobs(path):
+    """Total jobs in a jobs file (invalid specs count once, as failures)"""
+    return sum(spec.repeat if isinstance(spec, BatchSpec) else 1 for _, spec in read_specs(path))
+
+
+class BatchRun:
+    """Feeds specs to a TaskEngine and collects the outcome of every job"""
+
+    def __init__(self, jobs_path, report_path, concurrency, max_retries):
+        self.jobs_path = jobs_path
+        self.report_path = report_path
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        # The AIMD ceiling defaults to max_concurrent_tasks; this process only runs
+        # the batch, so let the shared controller grow to the requested concurrency
+        rate_limiter.controller = AimdController(maximum=float(concurrency))
+        # Every job here is bulk; there is no interactive work to keep slots for
+        self.scheduler = JobScheduler(max_concurrent=concurrency, controller=rate_limiter.controller,
+                                      interactive_reserve=0)
+        self.engine = TaskEngine(scheduler=self.scheduler)
+        self.events = queue.Queue()  # (job, outcome) from the engine thread
+        self.retries = []  # heap of (due time, seq, spec, repeat index, attempt, task_id)
+        self.in_flight = 0
+        self.total = 0
+        self.done = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.started_at = None
+        self._last_status = 0.0
+
+    def _pending_jobs(self):
+        """Yield (spec, repeat index) or (line number, error) lazily from the jobs file"""
+        for line_no, spec in read_specs(self.jobs_path):
+            if isinstance(spec, BatchSpec):
+                for index in range(spec.repeat):
+                    yield spec, index
+            else:
+                yield line_no, spec
+
+    def run(self):
+        self.total = count_jobs(self.jobs_path)
+        print(f"[Batch] {self.total} job(s) from {self.jobs_path}, concurrency {self.concurrency}")
+        self.started_at = time.monotonic()
+        pending = self._pending_jobs()
+        exhausted = False
+        window = self.concurrency * WINDOW_FACTOR
+        with open(self.report_path, "a", encoding="utf-8") as report:
+            self.report = report
+            try:
+                while True:
+                    while not exhausted and self.in_flight < window:
+                        item = next(pending, None)
+                        if item is None:
+                            exhausted = True
+                        elif isinstance(item[0], BatchSpec):
+                            self._start(item[0], item[1], 0)
+                        else:
+                            self._record_invalid(*item)
+                    self._start_due_retries()
+                    if exhausted and not self.in_flight and not self.retries:
+                        break
+                    try:
+                        self._handle(*self.events.get(timeout=0.5))
+                    except queue.Empty:
+                        pass
+                    self._print_status()
+            finally:
+                self.engine.stop()
+                history_mgr.flush()
+        self._print_status(final=True)
+        return self.failed == 0
+
+    def _start(self, spec, index, attempt, task_id=None):
+        job = Job(spec.prompt, spec.model, spec.ratio, spec.size, spec.refs, task_id=task_id,
+                  variants=spec.variants, priority=PRIORITY_BULK)
+        job.spec, job.index, job.attempt = spec, index, attempt
+        job.outcome = None
+        job.submitted_at = time.monotonic()
+        job.on_finished = self._on_finished
+        job.on_done = lambda j: self.events.put((j, j.outcome))
+        self.in_flight += 1
+        self.engine.submit(job)
+
+    def _on_finished(self, job, success, result, reason):
+        # Extra variants keep downloading after the first success; the first call wins
+        if job.outcome is None:
+            job.outcome = (success, result, reason)
+
+    def _start_due_retries(self):
+        now = time.monotonic()
+        while self.retries and self.retries[0][0] <= now:
+            _, _, spec, index, attempt, task_id = heapq.heappop(self.retries)
+            self._start(spec, index, attempt, task_id)
+
+    def _handle(self, job, outcome):
+        self.in_flight -= 1
+        success, result, reason = outcome or (False, "Cancelled", "Cancelled")
+        if not success and outcome is not None and job.attempt < self.max_retries:
+            delay = retry_policy.delay(job.failure_class, job.attempt)
+            if delay is not None:
+                task_id = job.task_id if job.failure_class == DOWNLOAD else None
+                heapq.heappush(self.retries, (time.monotonic() + delay, job.id, job.spec, job.index,
+                                              job.attempt + 1, task_id))
+                return
+        self.done += 1
+        if success:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        result_paths = None
+        if success:
+            # Every variant is in the history record by now; on_finished only saw the first
+            task = history_mgr.get_task(job.task_id) or {}
+            result_paths = task.get("result_paths") or [result]
+        self._write({
+            "line": job.spec.line_no,
+            "repeat": job.index,
+            "prompt": job.prompt,
+            "model": job.model,
+            "ratio": job.ratio,
+            "size": job.size,
+            "task_id": job.task_id,
+            "success": success,
+            "result_path": result if success else None,
+            "result_paths": result_paths,
+            "error": None if success else result,
+            "failure_reason": None if success else reason,
+            "failure_class": None if success else job.failure_class,
+            "attempts": job.attempt + 1,
+            "seconds": round(time.monotonic() - job.submitted_at, 2),
+        })
+
+    def _record_invalid(self, line_no, error):
+        self.done += 1
+        self.failed += 1
+        self._write({"line": line_no, "success": False, "error": error, "failure_reason": "Invalid Spec"})
+
+    def _write(self, record):
+        self.report.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.report.flush()
+
+    def _print_status(self, final=False):
+        now = time.monotonic()
+        interactive = sys.stdout.isatty()
+        if not final and now - self._last_status < (0.5 if interactive else STATUS_INTERVAL):
+            return
+        self._last_status = now
+        elapsed = now - self.started_at
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - self.done
+        eta = _format_seconds(remaining / rate) if rate > 0 and remaining > 0 else "--:--"
+        running = self.scheduler.get_stats()["running"]
+        line = (f"[Batch] {self.done}/{self.total} done ({self.succeeded} ok, {self.failed} failed), "
+                f"{running} running, {self.in_flight - running} queued, {len(self.retries)} waiting to retry | "
+                f"{rate * 60:.1f} jobs/min | elapsed {_format_seconds(elapsed)} | ETA {eta}")
+        if interactive and not final:
+            print("\r" + line, end="", flush=True)
+        else:
+            print(("\r" if interactive else "") + line, flush=True)
+
+
+def _format_seconds(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.batch",
+                                     description="Run image generation jobs from a JSONL file without the GUI.")
+    parser.add_argument("jobs", help="JSONL file, one job spec per line")
+    parser.add_argument("--report", help="JSONL report to append results to (default: <jobs>.report.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=cfg.get("max_concurrent_tasks", 10),
+                        help="tasks in flight at once (default: max_concurrent_tasks)")
+    parser.add_argument("--retries", type=int, default=cfg.get("max_retries", 5),
+                        help="retries per job, within each failure class's budget (default: max_retries)")
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.jobs):
+        parser.error(f"jobs file not found: {args.jobs}")
+    if not cfg.get("api_key"):
+        parser.error("no api_key set in config.json")
+    report_path = args.report or os.path.splitext(args.jobs)[0] + ".report.jsonl"
+
+    run = BatchRun(args.jobs, report_path, max(1, args.concurrency), max(0, args.retries))
+    try:
+        ok = run.run()
+    except KeyboardInterrupt:
+        print("\n[Batch] Interrupted; unfinished tasks stay in history and resume in the GUI")
+        return 130
+    print(f"[Batch] Report written to {report_path}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,8 @@
 import json
 import os
 
+from core.persistence import WriteBehind, atomic_write_json
+
 CONFIG_FILE = 'config.json'
 
 DEFAULT_CONFIG = {
@@ -16,19 +18,71 @@ DEFAULT_CONFIG = {
     # Shared parameters
     "auto_retry_on_failure": False,
     "parallel_tasks": 1,
+    # Job scheduler: tasks in flight at once (all clicks combined) and optional per-model caps
+    "max_concurrent_tasks": 10,
+    "model_concurrency": {},
+    # Slots only interactive (clicked) tasks may use, so bulk/recovered work cannot starve them
+    "interactive_reserved_slots": 1,
+    # API rate limiting: shared token bucket (requests/s, 0 = unlimited) and throttle handling
+    "api_rate_limit": 10.0,
+    "api_rate_burst": 20,
+    "throttle_cooldown": 5.0,
+    "rate_limit_codes": [],
+    # Per failure class overrides, e.g. {"network": {"base": 1, "max_delay": 30, "budget": 5}}
+    "retry_policy": {},
     "max_retries": 5,
+    # Startup recovery of tasks left running by the previous session (older ones are marked failed)
+    "recover_unfinished_tasks": True,
+    "recover_max_age_hours": 24,
+    # Prompt Matrix: expand {a|b|c} lists into a sweep (largest sweep allowed)
+    "prompt_matrix_enabled": False,
+    "matrix_max_jobs": 5000,
     "theme": "auto",
     "text_format_enabled": True,
     "text_font_size": 12,
     "text_font_family": "Arial",
     "text_auto_wrap": True,
-    # History page settings
-    "history_items_per_page": 5
+    # History page: rows fetched per batch while scrolling
+    "history_fetch_batch": 100,
+    # History storage: "sqlite" or "journal" (append-only JSONL + snapshot)
+    "history_backend": "sqlite",
+    "history_journal_compact_kb": 1024,
+    # Write-behind persistence: coalesce config/history writes within this window
+    "persist_debounce_ms": 500,
+    # HTTP connection pool
+    "http_pool_maxsize": 10,
+    "http_connect_timeout": 10,
+    "http_read_timeout": 30,
+    # Result downloads (streamed to disk)
+    "download_read_timeout": 120,
+    "download_chunk_size": 262144,
+    "variant_download_concurrency": 4,
+    # Reference images
+    "ref_cache_max_mb": 256,
+    "ref_preprocess_enabled": False,
+    "ref_upload_format": "jpeg",
+    "ref_max_bytes": 1572864,
+    "ref_max_edge": {},
+    "ref_preprocess_workers": 2,
+    "stream_upload_enabled": True,
+    "stream_upload_threshold_mb": 4,
+    # Result polling
+    "poll_min_interval": 0.5,
+    "poll_max_interval": 10.0,
+    "poll_tick_window": 0.5,
+    "poll_max_rate": 20,
+    # A task answering -22 ("not found") for this many seconds in a row is marked failed
+    "poll_not_found_timeout": 300,
+    # Thumbnail cache (cache/thumbs), evicted least recently used beyond this size
+    "thumb_cache_max_mb": 128,
+    "thumb_decode_workers": 4
 }
 
 class Config:
     def __init__(self):
         self.data = self.load_config()
+        self.writer = WriteBehind("config", self.save_config,
+                                  self.data.get("persist_debounce_ms", 500) / 1000)
 
     def load_config(self):
         if not os.path.exists(CONFIG_FILE):
@@ -53,6 +107,8 @@ class Config:
             migrated["nano_banana_aspect_ratio"] = migrated.pop("last_aspect_ratio", "auto")
         if "last_image_size" in migrated:
             migrated["nano_banana_image_size"] = migrated.pop("last_image_size", "1K")
+        # History is no longer paged; the list loads in batches instead
+        migrated.pop("history_items_per_page", None)
         
         # Ensure all required keys exist
         for key, value in DEFAULT_CONFIG.items():
@@ -63,15 +119,21 @@ class Config:
 
     def save_config(self, data=None):
         if data is None:
-            data = self.data
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+            data = dict(self.data)
+        atomic_write_json(CONFIG_FILE, data)
 
     def get(self, key, default=None):
         return self.data.get(key, default)
 
     def set(self, key, value):
+        """Update a value; the file is written by the background flusher"""
+        if self.data.get(key) == value and key in self.data:
+            return
         self.data[key] = value
-        self.save_config()
+        self.writer.mark_dirty()
+
+    def flush(self):
+        """Write pending changes to disk immediately"""
+        self.writer.flush()
 
 cfg = Config()
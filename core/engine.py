@@ -0,0 +1,361 @@
+"""
+Task Engine - Runs submit, poll and download for every task on one asyncio loop
+
+All tasks are coroutines on a single background thread. Blocking HTTP and
+disk work is handed to a small fixed-size executor, so the number of OS
+threads stays constant no matter how many tasks are in flight.
+"""
+import asyncio
+import functools
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from core.config import cfg
+from core.api_client import api
+from core.history_manager import history_mgr
+from core.poller import PollScheduler
+from core.scheduler import JobScheduler, PRIORITY_INTERACTIVE
+from core.rate_limit import rate_limiter
+from core.retry_policy import (retry_policy, classify_response, classify_task_failure,
+                               NETWORK, THROTTLED, DOWNLOAD, SERVER)
+
+_job_ids = itertools.count(1)
+
+
+class Job:
+    """A single generation task tracked by the engine.
+
+    Callbacks are invoked on the engine thread:
+        on_started(job)  - admitted by the scheduler (at once when resuming a
+                           task_id), about to submit or poll
+        on_progress(job, progress, status)
+        on_finished(job, success, result_path_or_msg, failure_reason)
+        on_done(job)  - always called last, even when cancelled
+
+    After a failed on_finished, failure_class holds the retry_policy class;
+    for "download" failures task_id can be reused to fetch the result again.
+    """
+
+    def __init__(self, prompt, model, ratio, size, ref_urls, task_id=None, variants=1,
+                 priority=PRIORITY_INTERACTIVE):
+        self.id = next(_job_ids)
+        self.prompt = prompt
+        self.model = model
+        self.ratio = ratio
+        self.size = size
+        self.ref_urls = ref_urls
+        self.task_id = task_id
+        self.variants = variants
+        self.priority = priority
+        self.failure_class = None
+        self.cancelled = False
+        self.on_started = None
+        self.on_progress = None
+        self.on_finished = None
+        self.on_done = None
+
+    def fail(self, message, reason, failure_class):
+        self.failure_class = failure_class
+        self._emit("on_finished", False, message, reason)
+
+    def _emit(self, name, *args):
+        callback = getattr(self, name)
+        if callback is None:
+            return
+        try:
+            callback(self, *args)
+        except Exception as e:
+            print(f"[Job] Error in {name} callback: {e}")
+
+
+class TaskEngine:
+    """Owns the asyncio loop thread and the blocking-I/O executor"""
+
+    def __init__(self, io_workers=None, scheduler=None):
+        self.io_workers = io_workers
+        self._loop = None
+        self._thread = None
+        self._io = None
+        self._tasks = {}  # job id -> asyncio.Task
+        self._start_lock = threading.Lock()
+        self.poller = PollScheduler(self._io_call)
+        self.scheduler = scheduler or JobScheduler(controller=rate_limiter.controller)
+
+    # ---- lifecycle -------------------------------------------------------
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            workers = self.io_workers or cfg.get("http_pool_maxsize", 10)
+            self._io = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="engine-io")
+            self._loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run_loop, args=(ready,), name="task-engine", daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def _run_loop(self, ready):
+        asyncio.set_event_loop(self._loop)
+        self._loop.call_soon(ready.set)
+        self._loop.run_forever()
+
+    def stop(self, timeout=3.0):
+        """Cancel every job and shut the loop down"""
+        with self._start_lock:
+            if self._thread is None:
+                return
+            loop, thread = self._loop, self._thread
+            future = asyncio.run_coroutine_threadsafe(self._cancel_all(), loop)
+            try:
+                future.result(timeout)
+            except Exception as e:
+                print(f"[TaskEngine] Error cancelling jobs: {e}")
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+            self._io.shutdown(wait=False, cancel_futures=True)
+            if not thread.is_alive():
+                loop.close()
+            self._loop = self._thread = self._io = None
+
+    async def _cancel_all(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        await self.poller.close()
+
+    # ---- job control (thread-safe) --------------------------------------
+
+    def submit(self, job):
+        self.start()
+        self._loop.call_soon_threadsafe(self._spawn, job)
+        return job
+
+    def cancel(self, job):
+        job.cancelled = True
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._cancel_task, job.id)
+
+    def active_count(self):
+        return len(self._tasks)
+
+    def _spawn(self, job):
+        if job.cancelled:
+            job._emit("on_done")
+            return
+        task = self._loop.create_task(self._run_job(job))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda t: self._tasks.pop(job.id, None))
+
+    def _cancel_task(self, job_id):
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+
+    # ---- job pipeline ----------------------------------------------------
+
+    async def _io_call(self, fn, *args, **kwargs):
+        return await self._loop.run_in_executor(self._io, functools.partial(fn, *args, **kwargs))
+
+    async def _run_job(self, job):
+        try:
+            if not job.task_id:
+                # Waits here while the global/per-model limits are reached. Jobs
+                # that already have a remote task (resumed polls, re-downloads)
+                # submit nothing, so they do not take a slot from new work.
+                await self.scheduler.acquire(job)
+            job._emit("on_started")
+            await self._process(job)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"[TaskEngine] Unexpected error in job {job.id}: {e}")
+            job.fail(str(e), "Unexpected Error", SERVER)
+        finally:
+            self.scheduler.release(job)
+            job._emit("on_done")
+
+    async def _process(self, job):
+        if not job.task_id:
+            try:
+                res = await self._submit(job)
+                if res.get("code") != 0:
+                    job.fail(res.get("msg", "Submission failed"), "Submission failed", classify_response(res))
+                    return
+                job.task_id = res["data"]["id"]
+                await self._io_call(history_mgr.add_task, job.task_id, job.prompt, job.model,
+                                    job.ratio, job.size, job.ref_urls)
+            except Exception as e:
+                print(f"[TaskEngine] Submission error: {e}")
+                job.fail(str(e), "Submission Exception", NETWORK)
+                return
+
+        entry = self.poller.register(job.task_id, job.model, job.size)
+        try:
+            await self._poll_until_done(job, entry)
+        finally:
+            self.poller.unregister(entry)
+
+    async def _submit(self, job):
+        """Submit through the shared rate limiter, retrying transient failures.
+
+        Network errors, throttling and 5xx responses are retried here with
+        their retry_policy backoff; anything else is returned to the caller.
+        """
+        attempts = {}
+        while True:
+            await asyncio.sleep(rate_limiter.reserve())
+            res = await self._io_call(api.submit_task, job.prompt, job.model, job.ratio,
+                                      job.size, job.ref_urls, job.variants)
+            if res.get("code") == 0:
+                return res
+            failure_class = classify_response(res)
+            if failure_class not in (NETWORK, THROTTLED, SERVER):
+                return res
+            attempt = attempts.get(failure_class, 0)
+            delay = retry_policy.delay(failure_class, attempt, res.get("retry_after"))
+            if delay is None:
+                return res
+            attempts[failure_class] = attempt + 1
+            job._emit("on_progress", 0, f"Submit {failure_class} error, retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+
+    async def _poll_until_done(self, job, entry):
+        attempts = {}  # failure class -> consecutive transient failures
+        not_found_since = None  # loop time of the first -22 in the current run
+        while True:
+            try:
+                res = await self.poller.next_result(entry)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[TaskEngine] API call error (attempt {attempts.get(NETWORK, 0) + 1}): {e}")
+                res = {"code": -1, "msg": f"Network error: {str(e)}", "network": True}
+
+            if res.get("code") == -22:
+                # Not registered yet, or gone (e.g. a task resumed after its result expired)
+                now = self._loop.time()
+                if not_found_since is None:
+                    not_found_since = now
+                if now - not_found_since < cfg.get("poll_not_found_timeout", 300):
+                    continue
+                await self._io_call(history_mgr.update_task, job.task_id, "failed",
+                                    failure_reason="Not Found", error_message=res.get("msg", ""))
+                job.fail(res.get("msg") or "Task not found", "Not Found", SERVER)
+                return
+            not_found_since = None
+
+            if res.get("code") != 0:
+                if res.get("throttled"):
+                    # Rate limited: the poller decides when to ask again
+                    continue
+                failure_class = classify_response(res)
+                if failure_class in (NETWORK, SERVER):
+                    attempt = attempts.get(failure_class, 0)
+                    delay = retry_policy.delay(failure_class, attempt)
+                    if delay is not None:
+                        attempts[failure_class] = attempt + 1
+                        await asyncio.sleep(delay)
+                        continue
+                reason = "Network Error" if failure_class == NETWORK else "API Error"
+                if failure_class != NETWORK:
+                    # The task is gone or unusable; a network failure may still be resumed later
+                    await self._io_call(history_mgr.update_task, job.task_id, "failed",
+                                        failure_reason=reason, error_message=res.get("msg", ""))
+                job.fail(res.get("msg", "Unknown error"), reason, failure_class)
+                return
+            attempts.clear()
+
+            data = res.get("data", {})
+            status = data.get("status")
+            job._emit("on_progress", data.get("progress", 0), status)
+
+            if status == "succeeded":
+                self.poller.record_success(entry)
+                await self._finish_success(job, data.get("results", []))
+                return
+            elif status == "failed":
+                reason = data.get("failure_reason", "Unknown")
+                error_msg = data.get("error", "")
+                await self._io_call(history_mgr.update_task, job.task_id, "failed",
+                                    failure_reason=reason, error_message=error_msg)
+                job.fail(reason, reason, classify_task_failure(reason, error_msg))
+                return
+
+    async def _finish_success(self, job, results):
+        if not results:
+            await self._io_call(history_mgr.update_task, job.task_id, "failed", failure_reason="No results found")
+            job.fail("No results found", "No Results", SERVER)
+            return
+
+        # Variants are fetched concurrently; the first one to land is shown at
+        # once and the rest are added to the history record as they arrive
+        limit = asyncio.Semaphore(max(1, cfg.get("variant_download_concurrency", 4)))
+        timestamp = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
+
+        async def fetch(idx, img_url):
+            attempt = 0
+            while True:
+                try:
+                    async with limit:
+                        return idx, await self._io_call(self._download_result, img_url, idx, len(results), timestamp)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Re-download the same URL; the image has already been paid for
+                    delay = retry_policy.delay(DOWNLOAD, attempt)
+                    if delay is None:
+                        raise
+                    attempt += 1
+                    print(f"[TaskEngine] Download error for variant {idx + 1}, retrying in {delay:.0f}s: {e}")
+                    await asyncio.sleep(delay)
+
+        downloads = [self._loop.create_task(fetch(idx, result.get("url")))
+                     for idx, result in enumerate(results) if result.get("url")]
+        downloaded = {}
+        try:
+            for next_done in asyncio.as_completed(downloads):
+                try:
+                    idx, filepath = await next_done
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"[TaskEngine] Download error: {e}")
+                    continue
+
+                downloaded[idx] = filepath
+                result_paths = [downloaded[i] for i in sorted(downloaded)]
+                if len(downloaded) == 1:
+                    await self._io_call(history_mgr.update_task, job.task_id, "succeeded",
+                                        result_path=filepath, preview_url=results[idx].get("url"),
+                                        result_paths=result_paths)
+                    job._emit("on_finished", True, filepath, "Success")
+                else:
+                    await self._io_call(history_mgr.update_task, job.task_id, "succeeded",
+                                        result_paths=result_paths)
+        finally:
+            for download in downloads:
+                download.cancel()
+
+        if not downloaded:
+            await self._io_call(history_mgr.update_task, job.task_id, "failed", failure_reason="Download failed")
+            job.fail("Download failed", "Download Failed", DOWNLOAD)
+
+    def _download_result(self, img_url, idx, count, timestamp):
+        """Download one result image (runs on the I/O executor)"""
+        ext = "png"
+        if ".jpg" in img_url: ext = "jpg"
+        if ".jpeg" in img_url: ext = "jpeg"
+
+        # For multiple variants, add index suffix
+        if count > 1:
+            filename = f"{timestamp}_{idx+1}.{ext}"
+        else:
+            filename = f"{timestamp}.{ext}"
+
+        return api.download_result(img_url, cfg.get("output_folder"), filename)
@@ -1,25 +1,66 @@
-import json
-import os
 from datetime import datetime
 
+from core.config import cfg
+from core.persistence import WriteBehind
+from core.history_store import SqliteHistoryStore, JournalHistoryStore, import_json_history
+
 HISTORY_FILE = 'history.json'
+HISTORY_DB = 'history.db'
+HISTORY_SNAPSHOT = 'history.snapshot.json'
+HISTORY_JOURNAL = 'history.journal.jsonl'
+
+def create_store(backend=None):
+    """Build the configured storage backend ("sqlite" or file-based "journal")"""
+    backend = backend or cfg.get("history_backend", "sqlite")
+    if backend == "journal":
+        compact_bytes = int(cfg.get("history_journal_compact_kb", 1024) * 1024)
+        return JournalHistoryStore(HISTORY_SNAPSHOT, HISTORY_JOURNAL, compact_bytes)
+    return SqliteHistoryStore(HISTORY_DB)
 
 class HistoryManager:
-    def __init__(self):
-        self.history = self.load_history()
+    def __init__(self, store=None, legacy_file=HISTORY_FILE):
+        self.store = store or create_store()
+        import_json_history(self.store, legacy_file)
+        # Changes are committed in batches by a background flusher
+        self.writer = WriteBehind("history", self.store.commit, cfg.get("persist_debounce_ms", 500) / 1000)
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Call callback(change, task_id, task, previous) after every change.
+
+        change is "added", "updated" or "removed" (task is None for removals).
+        previous is the record as it was before an update or removal, so
+        listeners can tell whether it used to pass their filters.
+        Callbacks run on the thread that made the change.
+        """
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, change, task_id, task=None, previous=None):
+        for callback in list(self._listeners):
+            try:
+                callback(change, task_id, dict(task) if task is not None else None,
+                         dict(previous) if previous is not None else None)
+            except Exception as e:
+                print(f"[History] Error in change listener: {e}")
 
     def load_history(self):
-        if not os.path.exists(HISTORY_FILE):
-            return []
-        try:
-            with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return []
+        return self.store.query()
+
+    @property
+    def history(self):
+        return self.get_all_tasks()
 
     def save_history(self):
-        with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(self.history, f, indent=4, ensure_ascii=False)
+        self.writer.mark_dirty()
+
+    def flush(self):
+        """Commit pending changes to disk immediately"""
+        self.writer.flush()
 
     def add_task(self, task_id, prompt, model, aspect_ratio, image_size, ref_images=None):
         task = {
@@ -34,27 +75,63 @@ class HistoryManager:
             "result_path": None,
             "preview_url": None
         }
-        self.history.insert(0, task) # Add to top
+        self.store.insert(task) # Add to top
         self.save_history()
+        self._notify("added", task_id, task)
         return task
 
-    def update_task(self, task_id, status, result_path=None, preview_url=None, failure_reason=None, error_message=None):
-        for task in self.history:
-            if task["id"] == task_id:
-                task["status"] = status
-                if result_path:
-                    task["result_path"] = result_path
-                if preview_url:
-                    task["preview_url"] = preview_url
-                if failure_reason:
-                    task["failure_reason"] = failure_reason
-                if error_message:
-                    task["error_message"] = error_message
-                self.save_history()
-                return task
-        return None
+    def update_task(self, task_id, status, result_path=None, preview_url=None, failure_reason=None, error_message=None, result_paths=None):
+        changes = {"status": status}
+        if result_path:
+            changes["result_path"] = result_path
+        if preview_url:
+            changes["preview_url"] = preview_url
+        if result_paths:
+            changes["result_paths"] = result_paths
+        if failure_reason:
+            changes["failure_reason"] = failure_reason
+        if error_message:
+            changes["error_message"] = error_message
+        previous = self.store.get(task_id)
+        if previous is None:
+            return None
+        if status in ("succeeded", "failed") and not previous.get("completed_at"):
+            changes["completed_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        task = self.store.update(task_id, changes)
+        if task is not None:
+            self.save_history()
+            self._notify("updated", task_id, task, previous)
+        return task
+
+    def remove_task(self, task_id):
+        previous = self.store.get(task_id)
+        if previous is None or not self.store.delete(task_id):
+            return False
+        self.save_history()
+        self._notify("removed", task_id, previous=previous)
+        return True
+
+    def get_task(self, task_id):
+        return self.store.get(task_id)
+
+    def get_tasks(self, offset=0, limit=None, model=None, status=None, text=None, date_from=None, date_to=None):
+        """Records newest first, optionally filtered.
+
+        text matches prompts (every whitespace-separated term must appear),
+        date_from/date_to bound created_at inclusively ("YYYY-MM-DD HH:MM:SS").
+        """
+        return self.store.query(offset, limit, model=model, status=status, text=text,
+                                date_from=date_from, date_to=date_to)
+
+    def count_tasks(self, model=None, status=None, text=None, date_from=None, date_to=None):
+        return self.store.count(model=model, status=status, text=text,
+                                date_from=date_from, date_to=date_to)
+
+    def search(self, text, offset=0, limit=None, **filters):
+        """Full-text prompt search combined with model/status/date filters"""
+        return self.get_tasks(offset, limit, text=text, **filters)
 
     def get_all_tasks(self):
-        return self.history
+        return self.store.query()
 
 history_mgr = HistoryManager()
@@ -0,0 +1,485 @@
+"""
+History Store - Storage backends for HistoryManager
+"""
+import itertools
+import json
+import os
+import sqlite3
+import threading
+
+from core.search_index import PromptIndex, split_terms, matches, short_grams, word_runs
+
+# Record fields that get their own column (and index) in SQLite
+INDEXED_FIELDS = ("model", "status", "created_at")
+# Range/text filters accepted by query() and count() in addition to INDEXED_FIELDS
+SEARCH_FILTERS = ("text", "date_from", "date_to")
+# FTS5 trigram matching needs at least this many characters per term;
+# shorter terms are looked up in the tasks_grams table instead
+TRIGRAM_MIN = 3
+
+
+def _like_pattern(term):
+    """Substring LIKE pattern for term (used with ESCAPE '\\')"""
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def record_matches(task, **filters):
+    """Whether a single record passes the query()/count() filters"""
+    for field, value in filters.items():
+        if field not in INDEXED_FIELDS and field not in SEARCH_FILTERS:
+            raise ValueError(f"Cannot filter on {field}")
+        if value is None or value == "":
+            continue
+        if field == "text":
+            if not matches(value, task.get("prompt")):
+                return False
+        elif field == "date_from":
+            if (task.get("created_at") or "") < value:
+                return False
+        elif field == "date_to":
+            if (task.get("created_at") or "") > value:
+                return False
+        elif task.get(field) != value:
+            return False
+    return True
+
+
+class SqliteHistoryStore:
+    """History records in a SQLite database (WAL mode).
+
+    The full record is kept as JSON in `data`; id, model, status and
+    created_at are mirrored into indexed columns for lookups and filtering.
+    Rows are ordered newest first by their insertion sequence.
+
+    insert() and update() leave their transaction open; commit() makes them
+    durable, so a burst of changes costs one commit.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id TEXT NOT NULL UNIQUE,
+                    model TEXT,
+                    status TEXT,
+                    created_at TEXT,
+                    data TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_model ON tasks(model)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at)")
+        self.fts = self._create_fts()
+
+    def _create_fts(self):
+        """Full-text index over prompts.
+
+        tasks_fts holds trigram tokens (also covering CJK text) for terms of
+        three or more characters. tasks_grams holds every one and two
+        character substring of each word/CJK run as a separate token, so
+        short terms are an exact index lookup as well.
+        """
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(prompt, tokenize='trigram')")
+                self._conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_grams "
+                    "USING fts5(grams, tokenize='unicode61 remove_diacritics 0')")
+                # Backfill databases created before the indexes existed
+                self._conn.execute("""
+                    INSERT INTO tasks_fts (rowid, prompt)
+                    SELECT seq, json_extract(data, '$.prompt') FROM tasks
+                    WHERE seq NOT IN (SELECT rowid FROM tasks_fts)
+                """)
+                missing = self._conn.execute("""
+                    SELECT seq, json_extract(data, '$.prompt') AS prompt FROM tasks
+                    WHERE seq NOT IN (SELECT rowid FROM tasks_grams)
+                """).fetchall()
+                self._conn.executemany("INSERT INTO tasks_grams (rowid, grams) VALUES (?, ?)",
+                                       ((row["seq"], self._grams(row["prompt"])) for row in missing))
+            return True
+        except sqlite3.OperationalError as e:
+            # SQLite older than 3.34 has no trigram tokenizer; fall back to LIKE scans
+            print(f"[History] Full-text index unavailable, using plain search: {e}")
+            return False
+
+    @staticmethod
+    def _grams(prompt):
+        return " ".join(short_grams(prompt))
+
+    def is_empty(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM tasks LIMIT 1").fetchone() is None
+
+    def _row_values(self, task):
+        return (task["id"], task.get("model"), task.get("status"), task.get("created_at"),
+                json.dumps(task, ensure_ascii=False))
+
+    def insert(self, task):
+        with self._lock:
+            # Re-adding an existing ID moves it to the top, like the old list insert
+            self._delete(task["id"])
+            cursor = self._conn.execute(
+                "INSERT INTO tasks (id, model, status, created_at, data) VALUES (?, ?, ?, ?, ?)",
+                self._row_values(task))
+            if self.fts:
+                self._conn.execute("INSERT INTO tasks_fts (rowid, prompt) VALUES (?, ?)",
+                                   (cursor.lastrowid, task.get("prompt") or ""))
+                self._conn.execute("INSERT INTO tasks_grams (rowid, grams) VALUES (?, ?)",
+                                   (cursor.lastrowid, self._grams(task.get("prompt"))))
+
+    def _delete(self, task_id):
+        row = self._conn.execute("SELECT seq FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if row is None:
+            return False
+        self._conn.execute("DELETE FROM tasks WHERE seq = ?", (row["seq"],))
+        if self.fts:
+            self._conn.execute("DELETE FROM tasks_fts WHERE rowid = ?", (row["seq"],))
+            self._conn.execute("DELETE FROM tasks_grams WHERE rowid = ?", (row["seq"],))
+        return True
+
+    def delete(self, task_id):
+        """Remove a record; returns False if it does not exist"""
+        with self._lock:
+            return self._delete(task_id)
+
+    def insert_many(self, tasks):
+        """Bulk insert, oldest first (used by the JSON importer)"""
+        with self._lock, self._conn:
+            for task in tasks:
+                self.insert(task)
+
+    def get(self, task_id):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def update(self, task_id, changes):
+        """Apply changes to a record and return it, or None if it does not exist"""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+            if row is None:
+                return None
+            task = json.loads(row["data"])
+            task.update(changes)
+            self._conn.execute(
+                "UPDATE tasks SET model = ?, status = ?, created_at = ?, data = ? WHERE id = ?",
+                (task.get("model"), task.get("status"), task.get("created_at"),
+                 json.dumps(task, ensure_ascii=False), task_id))
+            return task
+
+    def query(self, offset=0, limit=None, **filters):
+        """Records newest first, optionally filtered (see _where)"""
+        where, params = self._where(filters)
+        sql = f"SELECT t.data FROM tasks t{where} ORDER BY t.seq DESC"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        elif offset:
+            sql += " LIMIT -1 OFFSET ?"
+            params.append(offset)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def count(self, **filters):
+        where, params = self._where(filters)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM tasks t{where}", params).fetchone()[0]
+
+    def _where(self, filters):
+        """Build SQL for equality filters on INDEXED_FIELDS plus
+        text (prompt search), date_from and date_to (created_at range, inclusive)"""
+        clauses, params = [], []
+        for field, value in filters.items():
+            if field not in INDEXED_FIELDS and field not in SEARCH_FILTERS:
+                raise ValueError(f"Cannot filter on {field}")
+            if value is None or value == "":
+                continue
+            if field == "text":
+                terms = split_terms(value)
+                if not terms:
+                    continue
+                if self.fts:
+                    # Trigram MATCH for terms of 3+ chars, the one/two character gram index for
+                    # shorter ones. Kept as subqueries so SQLite resolves the text search first.
+                    long_terms, grams, literal = [], [], []
+                    for term in terms:
+                        if len(term) >= TRIGRAM_MIN:
+                            long_terms.append(term)
+                        elif word_runs(term) == [term.lower()]:
+                            grams.append(term.lower())
+                        else:
+                            # Punctuation is not in the gram index ("_", "g_"); check
+                            # these as escaped substrings of the prompt instead
+                            literal.append(term)
+                    if long_terms:
+                        clauses.append("t.seq IN (SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH ?)")
+                        params.append(self._match_expr(long_terms))
+                    if grams:
+                        clauses.append("t.seq IN (SELECT rowid FROM tasks_grams WHERE tasks_grams MATCH ?)")
+                        params.append(self._match_expr(grams))
+                    for term in literal:
+                        clauses.append("json_extract(t.data, '$.prompt') LIKE ? ESCAPE '\\'")
+                        params.append(_like_pattern(term))
+                else:
+                    escaped = [_like_pattern(term) for term in terms]
+                    clauses += ["json_extract(t.data, '$.prompt') LIKE ? ESCAPE '\\'"] * len(escaped)
+                    params += escaped
+            elif field == "date_from":
+                clauses.append("t.created_at >= ?")
+                params.append(value)
+            elif field == "date_to":
+                clauses.append("t.created_at <= ?")
+                params.append(value)
+            else:
+                clauses.append(f"t.{field} = ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    @staticmethod
+    def _match_expr(terms):
+        """FTS5 query requiring every term, each quoted as a literal string"""
+        return " AND ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+
+class JournalHistoryStore:
+    """File-based history: in-memory records plus an append-only JSONL journal.
+
+    Every insert/update appends one small line to the journal instead of
+    rewriting the whole history. On startup the snapshot is loaded and the
+    journal replayed on top of it; a torn last line from a crash is skipped.
+    Once the journal grows past `compact_bytes` a background thread folds it
+    into a fresh snapshot (temp file + rename) and truncates it, without
+    blocking writers while the snapshot is written.
+    """
+
+    def __init__(self, snapshot_path, journal_path, compact_bytes=1024 * 1024):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compact_bytes = compact_bytes
+        self._lock = threading.RLock()
+        self._records = {}  # id -> task, oldest first
+        self._seqs = {}     # id -> insertion sequence (prompt index key)
+        self._by_seq = {}   # seq -> task
+        self._next_seq = 0
+        self._index = PromptIndex()
+        self._compacting = False
+        self._compact_lock = threading.Lock()  # one compaction at a time
+        self._tail = None  # journal lines appended while a compaction runs
+        self._load()
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    def _load(self):
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                    for task in json.load(f):
+                        self._apply({"op": "add", "task": task})
+            except Exception as e:
+                print(f"[History] Could not read snapshot {self.snapshot_path}: {e}")
+        if os.path.exists(self.journal_path):
+            good_end = 0
+            with open(self.journal_path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # partially written last line from an interrupted write
+                    try:
+                        self._apply(json.loads(line))
+                    except (ValueError, KeyError):
+                        pass
+                    good_end = f.tell()
+                torn = f.seek(0, os.SEEK_END) > good_end
+            if torn:
+                # Drop the torn tail so new entries start on a clean line
+                with open(self.journal_path, 'r+b') as f:
+                    f.truncate(good_end)
+
+    def _apply(self, entry):
+        if entry["op"] == "add":
+            task = entry["task"]
+            old_seq = self._seqs.pop(task["id"], None)
+            if old_seq is not None:
+                self._index.remove(old_seq)
+                del self._by_seq[old_seq]
+            self._records.pop(task["id"], None)
+            self._records[task["id"]] = task
+            self._next_seq += 1
+            self._seqs[task["id"]] = self._next_seq
+            self._by_seq[self._next_seq] = task
+            self._index.add(self._next_seq, task.get("prompt"))
+        elif entry["op"] == "update":
+            task = self._records.get(entry["id"])
+            if task is not None:
+                task.update(entry["changes"])
+        elif entry["op"] == "remove":
+            if self._records.pop(entry["id"], None) is not None:
+                seq = self._seqs.pop(entry["id"])
+                self._index.remove(seq)
+                del self._by_seq[seq]
+
+    def _append(self, entry):
+        # Buffered until commit(); the record is already visible in memory
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        self._journal.write(line)
+        if self._tail is not None:
+            self._tail.append(line)  # not in the snapshot being written
+        if self._journal.tell() >= self.compact_bytes and not self._compacting:
+            self._compacting = True
+            threading.Thread(target=self.compact, name="history-compactor", daemon=True).start()
+
+    def is_empty(self):
+        with self._lock:
+            return not self._records
+
+    def insert(self, task):
+        with self._lock:
+            entry = {"op": "add", "task": task}
+            self._apply(entry)
+            self._append(entry)
+
+    def insert_many(self, tasks):
+        with self._lock:
+            for task in tasks:
+                self._apply({"op": "add", "task": task})
+        # Not journaled; the snapshot written here is their only copy on disk
+        self.compact()
+
+    def get(self, task_id):
+        with self._lock:
+            task = self._records.get(task_id)
+            return dict(task) if task else None
+
+    def update(self, task_id, changes):
+        with self._lock:
+            if task_id not in self._records:
+                return None
+            entry = {"op": "update", "id": task_id, "changes": changes}
+            self._apply(entry)
+            self._append(entry)
+            return dict(self._records[task_id])
+
+    def delete(self, task_id):
+        with self._lock:
+            if task_id not in self._records:
+                return False
+            entry = {"op": "remove", "id": task_id}
+            self._apply(entry)
+            self._append(entry)
+            return True
+
+    def _matching(self, filters):
+        for field in filters:
+            if field not in INDEXED_FIELDS and field not in SEARCH_FILTERS:
+                raise ValueError(f"Cannot filter on {field}")
+        active = {k: v for k, v in filters.items() if v is not None and v != ""}
+        text = active.pop("text", None)
+        date_from = active.pop("date_from", None)
+        date_to = active.pop("date_to", None)
+
+        if text and split_terms(text):
+            matches = sorted(self._index.search(text), reverse=True)
+            tasks = (self._by_seq[seq] for seq in matches)
+        else:
+            tasks = reversed(self._records.values())
+        for task in tasks:
+            if not all(task.get(k) == v for k, v in active.items()):
+                continue
+            created_at = task.get("created_at") or ""
+            if date_from and created_at < date_from:
+                continue
+            if date_to and created_at > date_to:
+                continue
+            yield task
+
+    def query(self, offset=0, limit=None, **filters):
+        with self._lock:
+            end = None if limit is None else offset + limit
+            return [dict(t) for t in itertools.islice(self._matching(filters), offset, end)]
+
+    def count(self, **filters):
+        with self._lock:
+            if not any(v is not None and v != "" for v in filters.values()):
+                return len(self._records)
+            return sum(1 for _ in self._matching(filters))
+
+    def compact(self):
+        """Fold the journal into a new snapshot and truncate it.
+
+        The snapshot is written and fsynced outside the store lock so inserts
+        and updates are not held up; entries appended meanwhile are kept in
+        memory and carried over into the fresh journal.
+        """
+        with self._compact_lock:
+            with self._lock:
+                self._compacting = True
+                records = [dict(task) for task in self._records.values()]
+                self._tail = []
+            try:
+                tmp_path = self.snapshot_path + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(records, f, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                with self._lock:
+                    os.replace(tmp_path, self.snapshot_path)
+                    # Only truncate once the snapshot is safely in place
+                    self._journal.close()
+                    self._journal = open(self.journal_path, 'w', encoding='utf-8')
+                    self._journal.writelines(self._tail)
+            except Exception as e:
+                print(f"[History] Compaction failed: {e}")
+            finally:
+                with self._lock:
+                    self._tail = None
+                    self._compacting = False
+
+    def commit(self):
+        with self._lock:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+
+    def close(self):
+        with self._lock:
+            self.commit()
+            self._journal.close()
+
+
+def import_json_history(store, json_path):
+    """One-time import of a legacy history.json into an empty store"""
+    if not os.path.exists(json_path) or not store.is_empty():
+        return 0
+    try:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            tasks = json.load(f)
+    except Exception as e:
+        print(f"[History] Could not read {json_path} for import: {e}")
+        return 0
+
+    tasks = [t for t in tasks if isinstance(t, dict) and t.get("id")]
+    # history.json is newest first; insert oldest first so sequence order matches
+    store.insert_many(reversed(tasks))
+    os.replace(json_path, json_path + ".imported")
+    print(f"[History] Imported {len(tasks)} record(s) from {json_path}")
+    return len(tasks)
@@ -0,0 +1,120 @@
+"""
+HTTP Pool - Shared keep-alive connection pool for all API traffic
+"""
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from core.config import cfg
+
+
+class PoolStats:
+    """Thread-safe counters for connection reuse"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0    # request served on an already-open connection
+        self.misses = 0  # request had to open a new TCP/TLS connection
+
+    def record(self, reused):
+        with self._lock:
+            if reused:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+class _CountingPoolMixin:
+    """Records whether each checked-out connection is already connected"""
+    stats = None
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        if self.stats is not None:
+            self.stats.record(getattr(conn, "sock", None) is not None)
+        return conn
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose urllib3 pools report hit/miss counts"""
+
+    def __init__(self, stats, **kwargs):
+        self._stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        attrs = {"stats": self._stats}
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": type("CountingHTTPConnectionPool", (_CountingPoolMixin, HTTPConnectionPool), attrs),
+            "https": type("CountingHTTPSConnectionPool", (_CountingPoolMixin, HTTPSConnectionPool), attrs),
+        }
+
+
+class HttpSessionPool:
+    """Keep-alive sessions backed by one shared connection pool.
+
+    Each thread gets its own requests.Session (sessions are not safe to share
+    across threads), but every session mounts the same adapter, so TCP/TLS
+    connections are reused regardless of which thread issues the request.
+    """
+
+    def __init__(self, pool_maxsize=None):
+        self.stats = PoolStats()
+        self.pool_maxsize = pool_maxsize or cfg.get("http_pool_maxsize", 10)
+        self.adapter = _PooledAdapter(
+            self.stats,
+            pool_connections=4,  # number of distinct hosts kept in the pool manager
+            pool_maxsize=self.pool_maxsize,  # keep-alive connections per host
+        )
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", self.adapter)
+            session.mount("https://", self.adapter)
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def timeout(self, read_timeout=None):
+        """(connect, read) timeout tuple from config"""
+        connect = cfg.get("http_connect_timeout", 10)
+        read = read_timeout if read_timeout is not None else cfg.get("http_read_timeout", 30)
+        return (connect, read)
+
+    def post(self, url, read_timeout=None, **kwargs):
+        kwargs.setdefault("timeout", self.timeout(read_timeout))
+        return self.session.post(url, **kwargs)
+
+    def get(self, url, read_timeout=None, **kwargs):
+        kwargs.setdefault("timeout", self.timeout(read_timeout))
+        return self.session.get(url, **kwargs)
+
+    def get_stats(self):
+        stats = self.stats.snapshot()
+        stats["pool_maxsize"] = self.pool_maxsize
+        return stats
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions.clear()
+        self.adapter.close()
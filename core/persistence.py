@@ -0,0 +1,88 @@
+"""
+Persistence - Write-behind flushing and atomic file writes
+"""
+import atexit
+import json
+import os
+import threading
+import time
+
+
+def atomic_write_json(path, data, indent=4):
+    """Write JSON to path via temp file + fsync + rename"""
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=indent, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class WriteBehind:
+    """Coalesces many mutations into one background write.
+
+    Callers mark state dirty from any thread; a daemon thread runs
+    `flush_fn` once the debounce window after the first unflushed mutation
+    has passed. flush() writes synchronously (used on shutdown) and pending
+    state is also flushed at interpreter exit.
+    """
+
+    def __init__(self, name, flush_fn, debounce=0.5):
+        self.name = name
+        self.flush_fn = flush_fn
+        self.debounce = debounce
+        self.writes = 0
+        self.writes_avoided = 0
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._dirty = False
+        self._dirty_since = 0.0
+        self._thread = None
+        atexit.register(self.flush)
+
+    def mark_dirty(self):
+        with self._cond:
+            if self._dirty:
+                self.writes_avoided += 1
+                return
+            self._dirty = True
+            self._dirty_since = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"{self.name}-flusher", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._dirty:
+                    self._cond.wait()
+                deadline = self._dirty_since + self.debounce
+                while self._dirty and time.monotonic() < deadline:
+                    self._cond.wait(deadline - time.monotonic())
+            self.flush()
+
+    def flush(self):
+        """Write pending changes now (no-op when clean)"""
+        with self._flush_lock:
+            with self._cond:
+                if not self._dirty:
+                    return
+                self._dirty = False
+            try:
+                self.flush_fn()
+                self.writes += 1
+            except Exception as e:
+                print(f"[WriteBehind] {self.name} flush failed: {e}")
+
+    def get_stats(self):
+        with self._cond:
+            return {"writes": self.writes, "writes_avoided": self.writes_avoided, "dirty": self._dirty}
@@ -0,0 +1,258 @@
+"""
+Poll Scheduler - One coalesced poller for every pending task ID
+
+Instead of each task polling /v1/draw/result on its own timer, tasks register
+here and await their next result. A single ticker picks the tasks that are due,
+caps them to a per-tick budget and spreads their requests evenly (with jitter)
+across the tick window, so the request rate stays steady however many tasks
+are in flight.
+
+How often each task is polled is decided by PollIntervalPolicy from the
+reported progress and how long the same model/size usually takes.
+"""
+import asyncio
+import random
+from datetime import datetime
+
+from core.config import cfg
+from core.api_client import api
+from core.history_manager import history_mgr
+from core.rate_limit import rate_limiter
+
+# Longest wait between polls while a model/size has no learned completion time
+UNLEARNED_MAX_INTERVAL = 2.0
+# Once a task runs past its estimate, wait this fraction of the overdue time
+OVERDUE_BACKOFF = 0.25
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class PollIntervalPolicy:
+    """Derives poll intervals from progress and per-model completion times.
+
+    The next poll is scheduled halfway to the estimated completion, so tasks
+    back off while they are far from done and are polled tightly near the
+    end. Tasks that run past the estimate without reporting progress (still
+    queued, or answering -22) back off in proportion to how overdue they
+    are. Until a model/size has completion samples (from history or this
+    session) it is polled every UNLEARNED_MAX_INTERVAL seconds. Intervals
+    are clamped to [poll_min_interval, poll_max_interval].
+    """
+
+    def __init__(self):
+        self.expected = {}  # "model@size" -> EWMA of completion seconds
+        self.seeded = False
+        self.succeeded = 0
+        self.success_polls = 0
+        self.total_polls = 0
+
+    @staticmethod
+    def key(model, size):
+        return f"{model}@{size}"
+
+    def interval(self, entry, now):
+        elapsed = max(now - entry.registered_at, 0.0)
+        progress = entry.progress
+        low = cfg.get("poll_min_interval", 0.5)
+        high = cfg.get("poll_max_interval", 10.0)
+        expected = self.expected.get(self.key(entry.model, entry.size))
+        if expected is None:
+            high = min(high, UNLEARNED_MAX_INTERVAL)
+        if 0 < progress < 100 and elapsed > 0:
+            # Extrapolate from the observed progress rate
+            interval = elapsed * (100 - progress) / progress / 2
+        elif expected is None:
+            # Nothing learned for this model/size yet; poll at a steady cadence
+            interval = UNLEARNED_MAX_INTERVAL
+        else:
+            remaining = expected - elapsed
+            interval = remaining / 2 if remaining > 0 else -remaining * OVERDUE_BACKOFF
+        return min(max(interval, low), high)
+
+    def record_success(self, entry, now):
+        """Learn the completion time of a task the poller just saw succeed.
+
+        The task finished somewhere between the last poll that saw it
+        pending and this one; the reported progress at that last poll (or
+        else the midpoint) places it, so the poll interval itself is not
+        learned as part of the duration.
+        """
+        duration = now - entry.registered_at
+        if entry.last_pending_at is not None:
+            last = entry.last_pending_at - entry.registered_at
+            if entry.last_pending_progress > 0:
+                estimate = last * 100 / entry.last_pending_progress
+            else:
+                estimate = (last + duration) / 2
+            duration = min(max(estimate, last), duration)
+        key = self.key(entry.model, entry.size)
+        previous = self.expected.get(key)
+        self.expected[key] = duration if previous is None else previous * 0.7 + duration * 0.3
+        self.succeeded += 1
+        self.success_polls += entry.polls
+
+    def seed(self, tasks):
+        """Learn completion times from recent history records"""
+        self.seeded = True
+        durations = {}
+        for task in tasks:
+            if task.get("status") != "succeeded" or not task.get("completed_at"):
+                continue
+            try:
+                start = datetime.strptime(task["created_at"], TIME_FORMAT)
+                end = datetime.strptime(task["completed_at"], TIME_FORMAT)
+            except (KeyError, TypeError, ValueError):
+                continue
+            seconds = (end - start).total_seconds()
+            if seconds > 0:
+                durations.setdefault(self.key(task.get("model"), task.get("image_size")), []).append(seconds)
+        for key, values in durations.items():
+            values.sort()
+            self.expected[key] = values[len(values) // 2]
+
+    def get_stats(self):
+        return {
+            "succeeded": self.succeeded,
+            "total_polls": self.total_polls,
+            "polls_per_success": self.success_polls / self.succeeded if self.succeeded else 0.0,
+            "expected_seconds": dict(self.expected),
+        }
+
+
+class PollEntry:
+    """Polling state for one task ID"""
+
+    def __init__(self, task_id, model, size, now):
+        self.task_id = task_id
+        self.model = model
+        self.size = size
+        self.registered_at = now
+        self.next_due = now
+        self.progress = 0
+        self.polls = 0
+        # Last poll that found the task still pending, and its progress then
+        self.last_pending_at = None
+        self.last_pending_progress = 0
+        self.waiter = None
+        self.in_flight = False
+
+
+class PollScheduler:
+    """Runs on the engine loop; `io_call` runs a blocking call on the executor"""
+
+    def __init__(self, io_call):
+        self.io_call = io_call
+        self.entries = {}  # task_id -> PollEntry
+        self.policy = PollIntervalPolicy()
+        self._ticker = None
+        self._seeding = None
+
+    def register(self, task_id, model, size="1K"):
+        loop = asyncio.get_running_loop()
+        if not self.policy.seeded and self._seeding is None:
+            # History is read on the executor; early tasks poll at the unlearned cadence meanwhile
+            self._seeding = loop.create_task(self._seed())
+        now = loop.time()
+        entry = PollEntry(task_id, model, size, now)
+        # First poll when the task might plausibly be close (soon, for models
+        # without samples), with jitter so a burst of submissions does not poll in lockstep
+        entry.next_due = now + self.policy.interval(entry, now) * random.uniform(0.75, 1.25)
+        self.entries[task_id] = entry
+        if self._ticker is None or self._ticker.done():
+            self._ticker = loop.create_task(self._run_ticker())
+        return entry
+
+    async def _seed(self):
+        try:
+            self.policy.seed(await self.io_call(history_mgr.get_tasks, limit=200))
+        except Exception as e:
+            self.policy.seeded = True
+            print(f"[PollScheduler] Could not learn completion times from history: {e}")
+
+    def unregister(self, entry):
+        # A retry may have registered the same task ID again; leave its entry alone
+        if self.entries.get(entry.task_id) is entry:
+            del self.entries[entry.task_id]
+        if entry.waiter is not None and not entry.waiter.done():
+            entry.waiter.cancel()
+
+    async def next_result(self, entry):
+        """Wait until the scheduler polls this task and return the API response"""
+        entry.waiter = asyncio.get_running_loop().create_future()
+        return await entry.waiter
+
+    async def close(self):
+        """Stop the ticker (engine shutdown)"""
+        ticker, self._ticker = self._ticker, None
+        if ticker is not None and not ticker.done():
+            ticker.cancel()
+            await asyncio.gather(ticker, return_exceptions=True)
+
+    def record_success(self, entry):
+        self.policy.record_success(entry, asyncio.get_running_loop().time())
+
+    def pending_count(self):
+        return len(self.entries)
+
+    def get_stats(self):
+        stats = self.policy.get_stats()
+        stats["pending"] = len(self.entries)
+        return stats
+
+    # ---- scheduling ------------------------------------------------------
+
+    async def _run_ticker(self):
+        loop = asyncio.get_running_loop()
+        while self.entries:
+            window = cfg.get("poll_tick_window", 0.5)
+            budget = max(1, int(cfg.get("poll_max_rate", 20) * window))
+            tick_start = loop.time()
+
+            due = [e for e in self.entries.values()
+                   if e.waiter is not None and not e.waiter.done()
+                   and not e.in_flight and e.next_due <= tick_start]
+            due.sort(key=lambda e: e.next_due)
+            due = due[:budget]
+
+            if due:
+                slot = window / len(due)
+                for i, entry in enumerate(due):
+                    entry.in_flight = True
+                    delay = i * slot + random.uniform(0, slot)
+                    loop.call_later(delay, self._start_poll, entry)
+
+            await asyncio.sleep(window)
+
+    def _start_poll(self, entry):
+        if self.entries.get(entry.task_id) is not entry:
+            entry.in_flight = False
+            return
+        asyncio.get_running_loop().create_task(self._poll(entry))
+
+    async def _poll(self, entry):
+        waiter = entry.waiter
+        try:
+            await asyncio.sleep(rate_limiter.reserve())
+            res = await self.io_call(api.get_task_result, entry.task_id)
+        except Exception as e:
+            now = asyncio.get_running_loop().time()
+            entry.next_due = now + self.policy.interval(entry, now)
+            entry.in_flight = False
+            if waiter is not None and not waiter.done():
+                waiter.set_exception(e)
+            return
+
+        entry.polls += 1
+        self.policy.total_polls += 1
+        now = asyncio.get_running_loop().time()
+        if res.get("code") == 0:
+            data = res.get("data", {})
+            entry.progress = data.get("progress", entry.progress) or 0
+            if data.get("status") not in ("succeeded", "failed"):
+                entry.last_pending_at = now
+                entry.last_pending_progress = entry.progress
+        elif res.get("code") == -22:
+            entry.last_pending_at = now
+        entry.next_due = now + self.policy.interval(entry, now)
+        entry.in_flight = False
+        if waiter is not None and not waiter.done():
+            waiter.set_result(res)
@@ -0,0 +1,73 @@
+"""
+Prompt Matrix - Expands templated prompts into combinatorial job sweeps
+
+A template marks alternatives with {a|b|c}:
+
+    a {red|blue} {cat|fox} in {watercolor|pixel art} style
+
+expands to every combination (2 x 2 x 2 = 8 prompts), optionally crossed
+with a list of aspect ratios and image sizes. Braces without a "|" are left
+as they are. Expansion is lazy so very large sweeps are never held in
+memory as a list, and combinations that produce the same prompt (ignoring
+whitespace differences) with the same ratio/size are only yielded once.
+"""
+import itertools
+import re
+
+# {a|b|c}: at least one "|" and no nested braces
+PLACEHOLDER = re.compile(r"\{([^{}]*\|[^{}]*)\}")
+
+
+def parse(template):
+    """Split a template into literal parts and option lists.
+
+    Returns (parts, choices) where len(parts) == len(choices) + 1 and the
+    prompt is parts[0] + choice[0] + parts[1] + ... Duplicate options in a
+    list are dropped.
+    """
+    parts = []
+    choices = []
+    last = 0
+    for match in PLACEHOLDER.finditer(template):
+        parts.append(template[last:match.start()])
+        options = [option.strip() for option in match.group(1).split("|")]
+        choices.append(list(dict.fromkeys(options)))
+        last = match.end()
+    parts.append(template[last:])
+    return parts, choices
+
+
+def is_template(template):
+    return PLACEHOLDER.search(template or "") is not None
+
+
+def expand(template, ratios=("auto",), sizes=("1K",)):
+    """Yield unique (prompt, ratio, size) combinations, lazily"""
+    parts, choices = parse(template)
+    seen = set()
+    for picks in itertools.product(*choices):
+        prompt = parts[0] + "".join(pick + part for pick, part in zip(picks, parts[1:]))
+        prompt = prompt.strip()
+        if not prompt:
+            continue
+        normalized = " ".join(prompt.split())
+        for ratio, size in itertools.product(ratios, sizes):
+            key = (normalized, ratio, size)
+            if key in seen:
+                continue
+            seen.add(key)
+            yield prompt, ratio, size
+
+
+def count(template, ratios=("auto",), sizes=("1K",), limit=None):
+    """Number of unique combinations expand() yields.
+
+    With limit, counting stops early and returns limit + 1 once the sweep
+    is known to be larger, so oversized templates are cheap to reject.
+    """
+    total = 0
+    for _ in expand(template, ratios, sizes):
+        total += 1
+        if limit is not None and total > limit:
+            break
+    return total
@@ -0,0 +1,202 @@
+"""
+Rate Limit - Shared token bucket and AIMD concurrency control for the Grsai API
+
+ApiClient reports every throttled response (HTTP 429/503, rate-limit codes or
+messages) and every accepted submission here. Throttling pauses the bucket
+until Retry-After has passed and halves the allowed number of in-flight
+tasks; each accepted submission grows it again by 1/limit, so the limit
+climbs by about one per round of successful submissions (additive increase,
+multiplicative decrease).
+
+reserve() hands out send times instead of sleeping, so asyncio callers can
+await the delay and blocking callers can use acquire().
+"""
+import email.utils
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from core.config import cfg
+
+# Window for the achieved-throughput metric (seconds)
+THROUGHPUT_WINDOW = 60.0
+# Pause used when a throttled response carries no Retry-After
+DEFAULT_RETRY_AFTER = 2.0
+# Response text that marks a rate-limit rejection with a 200 status
+THROTTLE_MESSAGES = ("rate limit", "too many requests", "too frequent", "频繁", "限流")
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def is_throttle_response(status_code, body=None):
+    """Whether an HTTP status / JSON body means we are being rate limited"""
+    if status_code in (429, 503):
+        return True
+    if not isinstance(body, dict) or body.get("code") in (0, -22, None):
+        return False
+    if body.get("code") in cfg.get("rate_limit_codes", []):
+        return True
+    msg = str(body.get("msg", "")).lower()
+    return any(marker in msg for marker in THROTTLE_MESSAGES)
+
+
+class AimdController:
+    """Additive-increase/multiplicative-decrease limit on in-flight tasks"""
+
+    def __init__(self, initial=None, minimum=1.0, maximum=None, decrease=0.5, cooldown=None):
+        self._maximum = maximum
+        self.minimum = minimum
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.value = float(initial if initial is not None else self.maximum)
+        self._last_decrease = float("-inf")
+        self._lock = threading.Lock()
+
+    @property
+    def maximum(self):
+        if self._maximum is not None:
+            return self._maximum
+        return float(max(1, cfg.get("max_concurrent_tasks", 10)))
+
+    @property
+    def limit(self):
+        """Current allowed number of in-flight tasks (at least 1)"""
+        with self._lock:
+            return max(1, int(min(self.value, self.maximum)))
+
+    def on_success(self):
+        with self._lock:
+            self.value = min(self.value + 1.0 / max(self.value, 1.0), self.maximum)
+
+    def on_throttle(self, now=None):
+        """Cut the limit; a burst of throttles within one cooldown counts once"""
+        now = time.monotonic() if now is None else now
+        cooldown = self.cooldown if self.cooldown is not None else cfg.get("throttle_cooldown", 5.0)
+        with self._lock:
+            if now - self._last_decrease < cooldown:
+                return False
+            self._last_decrease = now
+            self.value = max(self.value * self.decrease, self.minimum)
+            return True
+
+
+class RateLimiter:
+    """Token bucket shared by every API call plus the AIMD controller"""
+
+    def __init__(self, rate=None, burst=None, controller=None):
+        self._lock = threading.Lock()
+        self.reset(rate, burst, controller)
+
+    def reset(self, rate=None, burst=None, controller=None):
+        """Start over with a full bucket, no pause and zeroed counters.
+
+        Used where one process runs separate measured sessions (benchmark
+        runs); rate/burst None follow the config as usual.
+        """
+        with self._lock:
+            self._rate = rate
+            self._burst = burst
+            self.controller = controller or AimdController()
+            self._tokens = None
+            self._updated = time.monotonic()
+            self._paused_until = 0.0
+            self.requests = 0
+            self.throttle_events = 0
+            self.limit_decreases = 0
+            self._completions = deque()  # monotonic times of accepted submissions
+
+    @property
+    def rate(self):
+        """Requests per second (0 = unlimited)"""
+        return self._rate if self._rate is not None else cfg.get("api_rate_limit", 10.0)
+
+    @property
+    def burst(self):
+        return self._burst if self._burst is not None else max(1, cfg.get("api_rate_burst", 20))
+
+    @property
+    def limit(self):
+        return self.controller.limit
+
+    def reserve(self):
+        """Take a token and return how many seconds to wait before sending"""
+        with self._lock:
+            now = time.monotonic()
+            self.requests += 1
+            start = max(now, self._paused_until)
+            rate = self.rate
+            if rate <= 0:
+                return start - now
+            if self._tokens is None:
+                self._tokens = float(self.burst)
+            # Refill up to `start`, then spend one token (going negative queues the caller)
+            self._tokens = min(self._tokens + max(start - self._updated, 0.0) * rate, float(self.burst))
+            self._updated = max(start, self._updated)
+            self._tokens -= 1.0
+            if self._tokens >= 0:
+                return start - now
+            return start - now + (-self._tokens) / rate
+
+    def acquire(self):
+        """Blocking variant of reserve() for synchronous callers"""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def on_throttle(self, retry_after=None):
+        """Record a throttled response; returns the pause in seconds"""
+        pause = retry_after if retry_after is not None else DEFAULT_RETRY_AFTER
+        with self._lock:
+            self.throttle_events += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            # Tokens handed out before the pause are spent; refill only once it ends
+            self._tokens = 0.0
+            self._updated = self._paused_until
+        if self.controller.on_throttle():
+            with self._lock:
+                self.limit_decreases += 1
+        return pause
+
+    def on_success(self):
+        """Record an accepted submission"""
+        self.controller.on_success()
+        with self._lock:
+            self._completions.append(time.monotonic())
+
+    def paused_for(self):
+        with self._lock:
+            return max(self._paused_until - time.monotonic(), 0.0)
+
+    def get_stats(self):
+        limit = self.limit
+        now = time.monotonic()
+        with self._lock:
+            while self._completions and now - self._completions[0] > THROUGHPUT_WINDOW:
+                self._completions.popleft()
+            return {
+                "limit": limit,
+                "requests": self.requests,
+                "throttle_events": self.throttle_events,
+                "limit_decreases": self.limit_decreases,
+                "paused_for": max(self._paused_until - now, 0.0),
+                "submissions_per_min": len(self._completions) * 60.0 / THROUGHPUT_WINDOW,
+            }
+
+
+rate_limiter = RateLimiter()
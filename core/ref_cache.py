@@ -0,0 +1,101 @@
+"""
+Reference Cache - Keeps encoded reference images in memory between submits
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from core.config import cfg
+
+
+class DataUriCache:
+    """LRU cache of encoded data URIs keyed by path + mtime + size.
+
+    Parallel fan-out, retries and regenerations of the same prompt all send
+    the same reference files, so each file is read and base64-encoded once
+    and reused until it changes on disk or is evicted by the memory cap.
+    """
+
+    def __init__(self, max_bytes=None):
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> encoded str
+        self._size = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    @property
+    def max_bytes(self):
+        if self._max_bytes is not None:
+            return self._max_bytes
+        return int(cfg.get("ref_cache_max_mb", 256) * 1024 * 1024)
+
+    @staticmethod
+    def make_key(path):
+        st = os.stat(path)
+        return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+    def get(self, path, encode):
+        """Return the cached value for path, calling encode(path) on a miss"""
+        key = self.make_key(path)
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                return value
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Only one thread encodes a given file; the others wait and then hit
+        with key_lock:
+            with self._lock:
+                value = self._lookup(key)
+                if value is not None:
+                    return value
+                self.misses += 1
+            value = None
+            try:
+                value = encode(path)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+                    if value is not None:
+                        self._store(key, value)
+            return value
+
+    def _lookup(self, key):
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.bytes_saved += len(value)
+        return value
+
+    def _store(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = value
+        self._size += size
+        while self._size > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bytes_saved": self.bytes_saved,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
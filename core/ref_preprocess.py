@@ -0,0 +1,179 @@
+"""
+Reference Preprocessor - Shrinks reference images before they are uploaded
+
+Phone photos are often 10+ MB; sent as-is they become huge base64 JSON
+bodies, repeated for every reference. Images are downscaled to a per-model
+maximum edge and re-encoded to JPEG/WebP within a byte budget. Work runs on
+a small thread pool as soon as an image is added, so by the time Generate is
+clicked the upload-ready file is usually already on disk.
+
+Off unless "ref_preprocess_enabled" is set (Settings > Shrink Reference
+Images). Pillow is optional: without it references are uploaded unchanged.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from core.config import cfg
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# Longest edge sent upstream per model (overridable with the "ref_max_edge" config dict)
+DEFAULT_MAX_EDGE = {
+    "nano-banana-fast": 1536,
+    "nano-banana": 1536,
+    "nano-banana-pro": 2048,
+    "nano-banana-pro-vt": 2048,
+    "gpt-image-1.5": 1536,
+    "sora-image": 1536,
+}
+QUALITY_STEPS = (90, 85, 80, 70, 60, 50)
+# Finished jobs remembered so repeat submits skip the work; oldest dropped first
+MAX_FINISHED_JOBS = 256
+CACHE_DIR = os.path.join(os.getcwd(), "cache", "refs")
+
+
+class RefImagePreprocessor:
+    """Background downscale/re-encode of reference images"""
+
+    def __init__(self):
+        self._pool = None
+        self._futures = OrderedDict()  # job key -> Future[path], least recently used first
+        self._lock = threading.Lock()
+        self.sizes = {}  # source path -> {"original_bytes", "uploaded_bytes"}
+
+    def enabled(self):
+        return Image is not None and cfg.get("ref_preprocess_enabled", False)
+
+    def max_edge(self, model):
+        overrides = cfg.get("ref_max_edge", {}) or {}
+        return overrides.get(model, DEFAULT_MAX_EDGE.get(model, 1536))
+
+    def prefetch(self, path, model):
+        """Start preparing path for model in the background"""
+        if self.enabled() and os.path.isfile(path):
+            self._submit(path, model)
+
+    def resolve(self, path, model):
+        """Return the file that should be uploaded for path (waits if still running)"""
+        if not self.enabled() or not os.path.isfile(path):
+            return path
+        try:
+            return self._submit(path, model).result()
+        except Exception as e:
+            print(f"[RefPreprocess] Failed to process {path}: {e}")
+            return path
+
+    def _submit(self, path, model):
+        st = os.stat(path)
+        fmt = cfg.get("ref_upload_format", "jpeg").lower()
+        budget = cfg.get("ref_max_bytes", 1536 * 1024)
+        key = (os.path.abspath(path), st.st_mtime_ns, st.st_size, self.max_edge(model), fmt, budget)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                self._futures.move_to_end(key)
+                return future
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=cfg.get("ref_preprocess_workers", 2),
+                                                thread_name_prefix="ref-preprocess")
+            future = self._pool.submit(self._process, key)
+            self._futures[key] = future
+            self._evict()
+        # Outside the lock: runs right here if the job has already finished
+        future.add_done_callback(lambda done, key=key: self._on_done(key, done))
+        return future
+
+    def _on_done(self, key, future):
+        if future.cancelled() or future.exception() is not None:
+            # Let the next submit try again instead of replaying the failure
+            with self._lock:
+                if self._futures.get(key) is future:
+                    del self._futures[key]
+
+    def _evict(self):
+        finished = [key for key, future in self._futures.items() if future.done()]
+        for key in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._futures[key]
+
+    def _process(self, key):
+        src, _, original_bytes, max_edge, fmt, budget = key
+        ext = "webp" if fmt == "webp" else "jpg"
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        out_path = os.path.join(CACHE_DIR, f"{digest}.{ext}")
+
+        if not os.path.exists(out_path):
+            with Image.open(src) as img:
+                needs_resize = max(img.size) > max_edge
+                if not needs_resize and original_bytes <= budget:
+                    # Already small enough, upload the original untouched
+                    self._record(src, original_bytes, original_bytes)
+                    return src
+                data = self._encode(img, max_edge, fmt, budget)
+
+            if len(data) >= original_bytes:
+                # Flat PNGs can compress better than any re-encode
+                self._record(src, original_bytes, original_bytes)
+                return src
+
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_path = f"{out_path}.{threading.get_ident()}.part"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, out_path)
+
+        uploaded_bytes = os.path.getsize(out_path)
+        self._record(src, original_bytes, uploaded_bytes)
+        return out_path
+
+    def _encode(self, img, max_edge, fmt, budget):
+        img.draft("RGB", (max_edge, max_edge))  # cheap JPEG downscale at decode time
+        img = ImageOps.exif_transpose(img)
+        if fmt != "webp" and img.mode in ("RGBA", "LA", "P"):
+            rgba = img.convert("RGBA")
+            img = Image.new("RGB", rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.getchannel("A"))
+        elif img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGB")
+
+        pil_format = "WEBP" if fmt == "webp" else "JPEG"
+        edge = max_edge
+        while True:
+            scaled = img.copy()
+            scaled.thumbnail((edge, edge), Image.LANCZOS)
+            for quality in QUALITY_STEPS:
+                buf = io.BytesIO()
+                scaled.save(buf, pil_format, quality=quality)
+                if buf.tell() <= budget:
+                    return buf.getvalue()
+            if edge <= 512:
+                # Give up shrinking further, the smallest attempt is still a big win
+                return buf.getvalue()
+            edge = int(edge * 0.8)
+
+    def _record(self, src, original_bytes, uploaded_bytes):
+        with self._lock:
+            self.sizes[src] = {"original_bytes": original_bytes, "uploaded_bytes": uploaded_bytes}
+        if uploaded_bytes != original_bytes:
+            print(f"[RefPreprocess] {os.path.basename(src)}: "
+                  f"{original_bytes / 1048576:.1f} MB -> {uploaded_bytes / 1048576:.2f} MB")
+
+    def get_stats(self):
+        with self._lock:
+            original = sum(s["original_bytes"] for s in self.sizes.values())
+            uploaded = sum(s["uploaded_bytes"] for s in self.sizes.values())
+            return {
+                "files": len(self.sizes),
+                "original_bytes": original,
+                "uploaded_bytes": uploaded,
+                "per_file": dict(self.sizes),
+            }
+
+
+ref_preprocessor = RefImagePreprocessor()
@@ -0,0 +1,113 @@
+"""
+Retry Policy - Failure classes with their own backoff curves and budgets
+
+Failures are sorted into classes that call for different handling:
+
+    network         connection errors and timeouts only; retried quickly
+    throttled       rate limited by the API; waits at least Retry-After
+    content_policy  prompt or output rejected by moderation; few rerolls
+    download        generation succeeded but fetching the image failed;
+                    retried by downloading the existing result again
+    server          5xx responses or tasks the server marked failed
+    rejected        any other API error, including non-throttle 4xx
+                    responses (bad key, invalid parameters)
+
+Each class has a budget (retries allowed) and an exponential backoff with
+"equal jitter": half the backoff is fixed, the other half random, so
+retries from many tasks spread out without collapsing to zero delay.
+Classes can be tuned per key through cfg "retry_policy".
+"""
+import random
+
+from core.config import cfg
+
+NETWORK = "network"
+THROTTLED = "throttled"
+CONTENT_POLICY = "content_policy"
+DOWNLOAD = "download"
+SERVER = "server"
+REJECTED = "rejected"
+
+# Moderation markers in Grsai failure reasons / error messages
+CONTENT_POLICY_MARKERS = ("moderation", "policy", "violat", "sensitive", "nsfw", "违规", "敏感", "审核")
+
+
+class RetryRule:
+    """Backoff curve and budget for one failure class"""
+
+    def __init__(self, base, factor=2.0, max_delay=60.0, budget=3):
+        self.base = base
+        self.factor = factor
+        self.max_delay = max_delay
+        self.budget = budget
+
+    def backoff(self, attempt):
+        """Un-jittered delay before retry number `attempt` (0-based)"""
+        return min(self.base * self.factor ** attempt, self.max_delay)
+
+
+DEFAULT_RULES = {
+    NETWORK: RetryRule(base=1.0, max_delay=30.0, budget=5),
+    THROTTLED: RetryRule(base=5.0, max_delay=120.0, budget=6),
+    CONTENT_POLICY: RetryRule(base=2.0, max_delay=10.0, budget=1),
+    DOWNLOAD: RetryRule(base=2.0, max_delay=60.0, budget=5),
+    SERVER: RetryRule(base=3.0, max_delay=60.0, budget=3),
+    # Bad key / invalid parameters will not succeed by resubmitting
+    REJECTED: RetryRule(base=2.0, max_delay=10.0, budget=0),
+}
+
+
+def classify_response(res):
+    """Failure class of a non-successful API response dict"""
+    if res.get("throttled"):
+        return THROTTLED
+    if res.get("network"):
+        return NETWORK
+    if (res.get("http_status") or 0) >= 500:
+        return SERVER
+    if is_content_policy(res.get("msg")):
+        return CONTENT_POLICY
+    return REJECTED
+
+
+def classify_task_failure(reason, error=None):
+    """Failure class of a task the server reported as failed"""
+    if is_content_policy(reason) or is_content_policy(error):
+        return CONTENT_POLICY
+    return SERVER
+
+
+def is_content_policy(text):
+    text = str(text or "").lower()
+    return any(marker in text for marker in CONTENT_POLICY_MARKERS)
+
+
+class RetryPolicy:
+    """Decides whether and when to retry a failure of a given class"""
+
+    def __init__(self, rules=None):
+        self._rules = rules
+
+    def rule(self, failure_class):
+        if self._rules is not None:
+            return self._rules.get(failure_class, DEFAULT_RULES[SERVER])
+        rule = DEFAULT_RULES.get(failure_class, DEFAULT_RULES[SERVER])
+        overrides = cfg.get("retry_policy", {}).get(failure_class)
+        if overrides:
+            rule = RetryRule(overrides.get("base", rule.base), overrides.get("factor", rule.factor),
+                             overrides.get("max_delay", rule.max_delay), overrides.get("budget", rule.budget))
+        return rule
+
+    def delay(self, failure_class, attempt, retry_after=None):
+        """Seconds to wait before retry number `attempt` (0-based), or None once the budget is spent"""
+        rule = self.rule(failure_class)
+        if attempt >= rule.budget:
+            return None
+        backoff = rule.backoff(attempt)
+        delay = backoff / 2 + random.uniform(0, backoff / 2)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+retry_policy = RetryPolicy()
@@ -0,0 +1,163 @@
+"""
+Job Scheduler - Admits engine jobs under global and per-model concurrency limits
+
+Every job waits here before it is submitted, however it was started
+(Generate, retry, regenerate). Waiting jobs are served by priority class and
+first-come first-served within a class. A job whose model is at its own limit
+is skipped rather than blocking jobs for other models behind it.
+
+When a controller is given (the rate limiter's AIMD controller), its current
+limit further caps how many jobs may be in flight.
+
+Priority alone only orders the queue, so long-running bulk or background
+jobs could otherwise hold every slot. `interactive_reserve` slots (cfg
+"interactive_reserved_slots") are kept for interactive jobs: the other
+classes together may fill at most limit - reserve of them.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+
+from core.config import cfg
+
+# Priority classes, served lowest first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+PRIORITY_BACKGROUND = 2  # e.g. tasks recovered from a previous session
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BULK, PRIORITY_BACKGROUND)
+
+
+class _Waiter:
+    __slots__ = ("job", "future", "queued_at")
+
+    def __init__(self, job, future):
+        self.job = job
+        self.future = future
+        self.queued_at = time.monotonic()
+
+
+class JobScheduler:
+    """Bounded admission for jobs running on the engine loop.
+
+    acquire()/release() are called from engine coroutines; queued() and
+    get_stats() may be called from any thread.
+    """
+
+    def __init__(self, max_concurrent=None, model_limits=None, controller=None, interactive_reserve=None):
+        self._max_concurrent = max_concurrent
+        self._model_limits = model_limits
+        self._interactive_reserve = interactive_reserve
+        self.controller = controller
+        self._lock = threading.Lock()
+        self._queues = {priority: deque() for priority in PRIORITIES}
+        self._running = {}  # job id -> (model, priority)
+        self._per_model = {}  # model -> running count
+        self._non_interactive = 0  # running jobs below interactive priority
+        self.admitted = 0
+        self.total_wait = 0.0
+
+    @property
+    def max_concurrent(self):
+        if self._max_concurrent is not None:
+            limit = self._max_concurrent
+        else:
+            limit = max(1, cfg.get("max_concurrent_tasks", 10))
+        if self.controller is not None:
+            limit = min(limit, self.controller.limit)
+        return limit
+
+    def non_interactive_limit(self):
+        """Slots bulk and background jobs may hold together (always at least one)"""
+        limit = self.max_concurrent
+        reserve = self._interactive_reserve
+        if reserve is None:
+            reserve = cfg.get("interactive_reserved_slots", 1)
+        return max(1, limit - max(0, reserve))
+
+    def model_limit(self, model):
+        limits = self._model_limits if self._model_limits is not None else cfg.get("model_concurrency", {})
+        return limits.get(model)
+
+    def _has_room(self, model):
+        if len(self._running) >= self.max_concurrent:
+            return False
+        limit = self.model_limit(model)
+        return limit is None or self._per_model.get(model, 0) < limit
+
+    def _admit(self, job, waited):
+        self._running[job.id] = (job.model, job.priority)
+        self._per_model[job.model] = self._per_model.get(job.model, 0) + 1
+        if job.priority != PRIORITY_INTERACTIVE:
+            self._non_interactive += 1
+        self.admitted += 1
+        self.total_wait += waited
+
+    async def acquire(self, job):
+        """Wait until job may run; cancellation removes it from the queue"""
+        waiter = _Waiter(job, asyncio.get_running_loop().create_future())
+        with self._lock:
+            self._queues[job.priority].append(waiter)
+            self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                queue = self._queues[job.priority]
+                if waiter in queue:
+                    queue.remove(waiter)
+                    raise
+            # Admitted just as we were cancelled; give the slot back
+            self.release(job)
+            raise
+
+    def release(self, job):
+        with self._lock:
+            running = self._running.pop(job.id, None)
+            if running is None:
+                return
+            model, priority = running
+            self._per_model[model] -= 1
+            if priority != PRIORITY_INTERACTIVE:
+                self._non_interactive -= 1
+            self._dispatch()
+
+    def _dispatch(self):
+        """Admit waiting jobs in priority order while there is room (lock held)"""
+        now = time.monotonic()
+        non_interactive_limit = self.non_interactive_limit()
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            skipped = deque()
+            while queue and len(self._running) < self.max_concurrent:
+                if priority != PRIORITY_INTERACTIVE and self._non_interactive >= non_interactive_limit:
+                    break
+                waiter = queue.popleft()
+                if waiter.future.done():
+                    continue
+                if not self._has_room(waiter.job.model):
+                    skipped.append(waiter)
+                    continue
+                self._admit(waiter.job, now - waiter.queued_at)
+                waiter.future.set_result(None)
+            skipped.extend(queue)
+            self._queues[priority] = skipped
+
+    def queued(self):
+        """[(job, position, seconds waited)] for every waiting job, in service order"""
+        now = time.monotonic()
+        with self._lock:
+            waiters = [w for p in PRIORITIES for w in self._queues[p]]
+        return [(w.job, position, now - w.queued_at) for position, w in enumerate(waiters, 1)]
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "running": len(self._running),
+                "queued": sum(len(q) for q in self._queues.values()),
+                "limit": self.max_concurrent,
+                "non_interactive": self._non_interactive,
+                "per_model": {m: n for m, n in self._per_model.items() if n},
+                "admitted": self.admitted,
+                "avg_wait": self.total_wait / self.admitted if self.admitted else 0.0,
+            }
@@ -0,0 +1,110 @@
+"""
+Search Index - In-process inverted index over prompts
+
+Used by the file-based history backend (SQLite uses FTS5 instead). Latin
+text is indexed as lowercase words and CJK text as character bigrams, so
+queries in either script match substrings of the prompt. The index is
+updated incrementally as records are added.
+"""
+import re
+
+_CJK_CHARS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af"
+_TOKEN_RE = re.compile(f"[{_CJK_CHARS}]+|[^\\W_]+")
+_CJK_RE = re.compile(f"[{_CJK_CHARS}]")
+
+
+def split_terms(query):
+    """Whitespace-separated search terms (all must match)"""
+    return [term for term in query.split() if term]
+
+
+def matches(query, text):
+    """Whether every term of query occurs in text (case-insensitive substring)"""
+    text = (text or "").lower()
+    return all(term.lower() in text for term in split_terms(query))
+
+
+def tokenize(text):
+    tokens = set()
+    for match in _TOKEN_RE.finditer(text.lower()):
+        run = match.group()
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                tokens.add(run)
+            for i in range(len(run) - 1):
+                tokens.add(run[i:i + 2])
+        else:
+            tokens.add(run)
+    return tokens
+
+
+def word_runs(text):
+    """Lowercase word and CJK runs of text (punctuation and spaces dropped)"""
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def short_grams(text, max_len=2):
+    """Every substring of up to max_len characters within each word/CJK run.
+
+    Indexed as separate tokens so that short search terms (most Chinese
+    queries are one or two characters) can be looked up exactly instead of
+    scanning prompts.
+    """
+    grams = set()
+    for run in word_runs(text):
+        for size in range(1, max_len + 1):
+            for i in range(len(run) - size + 1):
+                grams.add(run[i:i + size])
+    return grams
+
+
+class PromptIndex:
+    """Maps tokens to the sequence numbers of the records that contain them"""
+
+    def __init__(self):
+        self.postings = {}  # token -> set of seq
+        self.prompts = {}   # seq -> lowercase prompt (for substring verification)
+
+    def add(self, seq, prompt):
+        prompt = (prompt or "").lower()
+        self.prompts[seq] = prompt
+        for token in tokenize(prompt):
+            self.postings.setdefault(token, set()).add(seq)
+
+    def remove(self, seq):
+        prompt = self.prompts.pop(seq, None)
+        if prompt is None:
+            return
+        for token in tokenize(prompt):
+            docs = self.postings.get(token)
+            if docs is not None:
+                docs.discard(seq)
+                if not docs:
+                    del self.postings[token]
+
+    def _token_matches(self, token):
+        """Records whose indexed tokens contain token as a substring"""
+        docs = set(self.postings.get(token, ()))
+        for word, word_docs in self.postings.items():
+            if token in word and word != token:
+                docs |= word_docs
+        return docs
+
+    def search(self, query):
+        """Sequence numbers of records whose prompt contains every query term"""
+        terms = [term.lower() for term in split_terms(query)]
+        if not terms:
+            return set(self.prompts)
+
+        candidates = None
+        for term in terms:
+            for token in tokenize(term):
+                docs = self._token_matches(token)
+                candidates = docs if candidates is None else candidates & docs
+                if not candidates:
+                    return set()
+        if candidates is None:
+            # Only punctuation in the query, verify against every prompt
+            candidates = set(self.prompts)
+        return {seq for seq in candidates
+                if all(term in self.prompts[seq] for term in terms)}
@@ -1,232 +1,283 @@
 """
 Task Manager - Handles all task-related logic independently from UI
 """
-import os
-import time
-import requests
-from datetime import datetime
-from PySide6.QtCore import QThread, Signal
+import threading
+from datetime import datetime, timedelta
+
+from PySide6.QtCore import QObject, QTimer, Signal
 
 from core.config import cfg
-from core.api_client import api
+from core.engine import Job, TaskEngine
 from core.history_manager import history_mgr
+from core.scheduler import PRIORITY_INTERACTIVE, PRIORITY_BULK
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# How often queued tasks are told their position and wait time (ms)
+QUEUE_STATUS_INTERVAL = 1000
 
 
-class TaskWorker(QThread):
-    """Worker thread for submitting and polling tasks"""
+class EngineBridge(QObject):
+    """Carries engine callbacks (engine thread) over to the Qt main thread"""
+    started = Signal(int)                     # job id
+    progress = Signal(int, int, str)          # job id, progress, status
+    finished = Signal(int, bool, str, str)    # job id, success, result_path/msg, failure_reason
+    done = Signal(int)                        # job id
+    recovered = Signal(list)                  # history records to resume
+
+
+class TaskWorker(QObject):
+    """Qt-side handle for a task running on the shared TaskEngine"""
+    queued_signal = Signal(int, float)        # queue position, seconds waited
+    started_signal = Signal()
     progress_signal = Signal(int, str)
     finished_signal = Signal(bool, str, str)  # success, result_path/msg, failure_reason
-    
-    def __init__(self, prompt, model, ratio, size, ref_urls, task_id=None, variants=1):
+    finished = Signal()
+
+    def __init__(self, manager, prompt, model, ratio, size, ref_urls, task_id=None, variants=1,
+                 priority=PRIORITY_INTERACTIVE):
         super().__init__()
-        self.prompt = prompt
-        self.model = model
-        self.ratio = ratio
-        self.size = size
-        self.ref_urls = ref_urls
-        self.task_id = task_id
-        self.variants = variants
+        self.manager = manager
+        self.job = Job(prompt, model, ratio, size, ref_urls, task_id=task_id, variants=variants,
+                       priority=priority)
+        self.is_running = False
+
+    @property
+    def task_id(self):
+        return self.job.task_id
+
+    def start(self):
         self.is_running = True
-        self.setTerminationEnabled(True)
+        self.manager.submit(self)
 
-    def run(self):
-        try:
-            if not self.task_id:
-                try:
-                    res = api.submit_task(self.prompt, self.model, self.ratio, self.size, self.ref_urls, self.variants)
-                    if res.get("code") != 0:
-                        self.finished_signal.emit(False, res.get("msg", "Submission failed"), "Submission failed")
-                        return
-                    self.task_id = res["data"]["id"]
-                    # Add to history
-                    history_mgr.add_task(
-                        self.task_id, 
-                        self.prompt, 
-                        self.model,
-                        self.ratio,
-                        self.size,
-                        self.ref_urls
-                    )
-                except Exception as e:
-                    print(f"[TaskWorker] Submission error: {e}")
-                    self.finished_signal.emit(False, str(e), "Submission Exception")
-                    return
-
-            error_count = 0
-            while self.is_running:
-                # Check stop flag at loop start
-                if not self.is_running:
-                    return
-                    
-                try:
-                    res = api.get_task_result(self.task_id)
-                    error_count = 0
-                except Exception as e:
-                    error_count += 1
-                    print(f"[TaskWorker] API call error (attempt {error_count}): {e}")
-                    if error_count > 5:
-                        self.finished_signal.emit(False, f"Network error: {str(e)}", "Network Error")
-                        return
-                    # Sleep in shorter intervals to respond to stop signals quickly
-                    for _ in range(4):
-                        if not self.is_running:
-                            return
-                        time.sleep(0.5)
-                    continue
-
-                try:
-                    if res.get("code") != 0:
-                        if res.get("code") == -22:
-                            # Task not ready yet, sleep in shorter intervals
-                            for _ in range(4):
-                                if not self.is_running:
-                                    return
-                                time.sleep(0.5)
-                            continue
-                        self.finished_signal.emit(False, res.get("msg", "Unknown error"), "API Error")
-                        return
-
-                    data = res.get("data", {})
-                    status = data.get("status")
-                    progress = data.get("progress", 0)
-                    
-                    if not self.is_running:
-                        return
-                    
-                    self.progress_signal.emit(progress, status)
-
-                    if status == "succeeded":
-                        results = data.get("results", [])
-                        if results:
-                            # Handle multiple images (variants)
-                            downloaded_files = []
-                            first_file = None
-                            
-                            for idx, result in enumerate(results):
-                                img_url = result.get("url")
-                                if not img_url:
-                                    continue
-                                    
-                                try:
-                                    img_data = requests.get(img_url, timeout=30).content
-                                    timestamp = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
-                                    ext = "png"
-                                    if ".jpg" in img_url: ext = "jpg"
-                                    if ".jpeg" in img_url: ext = "jpeg"
-                                    
-                                    # For multiple variants, add index suffix
-                                    if len(results) > 1:
-                                        filename = f"{timestamp}_{idx+1}.{ext}"
-                                    else:
-                                        filename = f"{timestamp}.{ext}"
-                                    
-                                    output_dir = cfg.get("output_folder")
-                                    if not os.path.exists(output_dir):
-                                        os.makedirs(output_dir)
-                                        
-                                    filepath = os.path.join(output_dir, filename)
-                                    with open(filepath, "wb") as f:
-                                        f.write(img_data)
-                                    
-                                    downloaded_files.append(filepath)
-                                    if idx == 0:
-                                        first_file = filepath
-                                except Exception as e:
-                                    print(f"[TaskWorker] Download error for image {idx}: {e}")
-                            
-                            if downloaded_files:
-                                # Update history with first file, but all files are downloaded to output folder
-                                history_mgr.update_task(self.task_id, "succeeded", result_path=first_file, preview_url=results[0].get("url"))
-                                self.finished_signal.emit(True, first_file, "Success")
-                            else:
-                                history_mgr.update_task(self.task_id, "failed", failure_reason="Download failed")
-                                self.finished_signal.emit(False, "Download failed", "Download Failed")
-                        else:
-                            history_mgr.update_task(self.task_id, "failed", failure_reason="No results found")
-                            self.finished_signal.emit(False, "No results found", "No Results")
-                        return
-
-                    elif status == "failed":
-                        reason = data.get("failure_reason", "Unknown")
-                        error_msg = data.get("error", "")
-                        history_mgr.update_task(self.task_id, "failed", failure_reason=reason, error_message=error_msg)
-                        self.finished_signal.emit(False, reason, reason)
-                        return
-                except Exception as e:
-                    print(f"[TaskWorker] Processing error: {e}")
-                    self.finished_signal.emit(False, str(e), "Processing Error")
-                    return
-
-                # Sleep in shorter intervals to respond to stop signals quickly
-                for _ in range(4):
-                    if not self.is_running:
-                        return
-                    time.sleep(0.5)
-        except Exception as e:
-            print(f"[TaskWorker] Unexpected error in run(): {e}")
-            try:
-                self.finished_signal.emit(False, str(e), "Unexpected Error")
-            except:
-                pass
-            
     def stop(self):
         self.is_running = False
+        self.manager.engine.cancel(self.job)
+
+
+class JobStream(QObject):
+    """Feeds a lazily generated sequence of jobs to the engine a window at a time.
+
+    jobs yields dicts with prompt, model, ratio, size, ref_urls and variants.
+    Only `window` workers exist at once; the next job is pulled from the
+    iterator as each one finishes, so large sweeps never create their
+    workers up front.
+    """
+    progress = Signal(int, int, int)  # done, succeeded, failed
+    finished = Signal()
+
+    def __init__(self, manager, jobs, window):
+        super().__init__()
+        self.manager = manager
+        self.jobs = iter(jobs)
+        self.window = max(1, window)
+        self.active = set()
+        self.done = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.stopped = False
+        self.exhausted = False
+        self.closed = False
+
+    def start(self):
+        self._fill()
+
+    def stop(self):
+        """Stop pulling jobs and cancel the ones in flight"""
+        self.stopped = True
+        for worker in list(self.active):
+            worker.stop()
+        self._check_finished()
+
+    def _fill(self):
+        while not self.stopped and not self.exhausted and len(self.active) < self.window:
+            params = next(self.jobs, None)
+            if params is None:
+                self.exhausted = True
+                break
+            worker = self.manager.create_worker(params["prompt"], params["model"], params["ratio"],
+                                                params["size"], params["ref_urls"],
+                                                variants=params.get("variants", 1), priority=PRIORITY_BULK)
+            worker.finished_signal.connect(lambda ok, r, m: self._on_result(ok))
+            worker.finished.connect(lambda w=worker: self._on_worker_done(w))
+            self.active.add(worker)
+            worker.start()
+        self._check_finished()
+
+    def _on_result(self, success):
+        if success:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+
+    def _on_worker_done(self, worker):
+        if worker not in self.active:
+            return
+        self.active.discard(worker)
+        self.done += 1
+        self.progress.emit(self.done, self.succeeded, self.failed)
+        self._fill()
+
+    def _check_finished(self):
+        if not self.closed and not self.active and (self.exhausted or self.stopped):
+            self.closed = True
+            self.manager.streams.discard(self)
+            self.finished.emit()
 
 
 class TaskManager:
     """Manages all active tasks and workers"""
-    
+
     def __init__(self):
         self.active_workers = {}  # task_widget -> worker
-    
-    def create_worker(self, prompt, model, ratio, size, ref_urls, variants=1):
-        """Create and return a new TaskWorker"""
-        worker = TaskWorker(prompt, model, ratio, size, ref_urls, variants=variants)
+        self.engine = TaskEngine()
+        self.bridge = EngineBridge()
+        self.bridge.started.connect(self._on_started)
+        self.bridge.progress.connect(self._on_progress)
+        self.bridge.finished.connect(self._on_finished)
+        self.bridge.done.connect(self._on_done)
+        self._handles = {}  # job id -> TaskWorker
+        self.queue_timer = None
+        self.streams = set()  # running JobStreams
+        # Records created before this are from earlier sessions
+        self.session_start = datetime.now().strftime(TIME_FORMAT)
+
+    @property
+    def scheduler(self):
+        return self.engine.scheduler
+
+    def create_worker(self, prompt, model, ratio, size, ref_urls, variants=1, task_id=None,
+                      priority=PRIORITY_INTERACTIVE):
+        """Create and return a new TaskWorker (lower priorities yield to interactive tasks).
+
+        With task_id the worker skips submission and resumes polling and
+        downloading an existing task.
+        """
+        worker = TaskWorker(self, prompt, model, ratio, size, ref_urls, task_id=task_id, variants=variants,
+                            priority=priority)
         return worker
-    
+
+    def create_stream(self, jobs, window=None):
+        """Create a JobStream feeding `jobs` at bulk priority (call start() to begin).
+
+        The window defaults to twice the scheduler limit, enough to keep
+        every slot busy while the rest of the sweep stays unexpanded.
+        """
+        if window is None:
+            window = self.scheduler.max_concurrent * 2
+        stream = JobStream(self, jobs, window)
+        self.streams.add(stream)
+        return stream
+
+    def recover_unfinished(self):
+        """Find tasks an earlier session left running, off the GUI thread.
+
+        Records too old to still be on the server are marked failed; the
+        rest are delivered through bridge.recovered for the UI to resume.
+        """
+        if not cfg.get("recover_unfinished_tasks", True):
+            return
+        threading.Thread(target=self._find_unfinished, name="task-recovery", daemon=True).start()
+
+    def _find_unfinished(self):
+        try:
+            cutoff = datetime.now() - timedelta(hours=cfg.get("recover_max_age_hours", 24))
+            cutoff = cutoff.strftime(TIME_FORMAT)
+            resumable = []
+            for task in history_mgr.get_tasks(status="running", date_to=self.session_start):
+                if (task.get("created_at") or "") < cutoff:
+                    history_mgr.update_task(task["id"], "failed", failure_reason="Interrupted",
+                                            error_message="The app was closed before this task finished.")
+                else:
+                    resumable.append(task)
+            print(f"[TaskManager] Recovering {len(resumable)} unfinished task(s)")
+            if resumable:
+                self.bridge.recovered.emit(resumable)
+        except Exception as e:
+            print(f"[TaskManager] Error recovering unfinished tasks: {e}")
+
+    def submit(self, worker):
+        """Hand a worker's job to the engine"""
+        job = worker.job
+        job.on_started = lambda j: self.bridge.started.emit(j.id)
+        job.on_progress = lambda j, p, s: self.bridge.progress.emit(j.id, p, s)
+        job.on_finished = lambda j, ok, r, m: self.bridge.finished.emit(j.id, ok, r, m)
+        job.on_done = lambda j: self.bridge.done.emit(j.id)
+        self._handles[job.id] = worker
+        self.engine.submit(job)
+        if self.queue_timer is None:
+            self.queue_timer = QTimer()
+            self.queue_timer.setInterval(QUEUE_STATUS_INTERVAL)
+            self.queue_timer.timeout.connect(self._report_queue)
+        if not self.queue_timer.isActive():
+            self.queue_timer.start()
+
+    def _report_queue(self):
+        """Tell waiting workers where they are in the scheduler queue"""
+        queued = self.scheduler.queued()
+        if not queued and not self._handles:
+            self.queue_timer.stop()
+            return
+        for job, position, waited in queued:
+            worker = self._handles.get(job.id)
+            if worker is not None and worker.is_running:
+                worker.queued_signal.emit(position, waited)
+
+    def _on_started(self, job_id):
+        worker = self._handles.get(job_id)
+        if worker is not None and worker.is_running:
+            worker.started_signal.emit()
+
+    def _on_progress(self, job_id, progress, status):
+        worker = self._handles.get(job_id)
+        if worker is not None and worker.is_running:
+            worker.progress_signal.emit(progress, status)
+
+    def _on_finished(self, job_id, success, result, reason):
+        worker = self._handles.get(job_id)
+        if worker is not None and worker.is_running:
+            worker.finished_signal.emit(success, result, reason)
+
+    def _on_done(self, job_id):
+        worker = self._handles.pop(job_id, None)
+        if worker is not None:
+            worker.is_running = False
+            worker.finished.emit()
+            worker.deleteLater()
+
     def stop_worker(self, task_widget):
         """Stop a specific worker"""
         if task_widget in self.active_workers:
             worker = self.active_workers[task_widget]
             worker.stop()
-            worker.deleteLater()
-    
+
     def register_worker(self, task_widget, worker):
         """Register a worker for a task"""
         # Stop existing worker if any
         if task_widget in self.active_workers:
             old_worker = self.active_workers[task_widget]
             old_worker.stop()
-            old_worker.deleteLater()
-        
+
         self.active_workers[task_widget] = worker
-    
-    def unregister_worker(self, task_widget):
-        """Unregister a worker"""
+
+    def unregister_worker(self, task_widget, worker=None):
+        """Unregister a worker (only if it is still the widget's current one)"""
         if task_widget in self.active_workers:
-            del self.active_workers[task_widget]
-    
+            if worker is None or self.active_workers[task_widget] is worker:
+                del self.active_workers[task_widget]
+
     def stop_all_workers(self):
         """Stop all active workers"""
-        print(f"[TaskManager] Stopping {len(self.active_workers)} worker thread(s)...")
+        print(f"[TaskManager] Stopping {len(self.active_workers)} task(s)...")
         try:
-            # Signal all workers to stop
             for worker in list(self.active_workers.values()):
-                try:
-                    worker.stop()
-                except Exception as e:
-                    print(f"[TaskManager] Error stopping worker: {e}")
-            
-            # Wait for all workers to finish with a timeout
-            for i, worker in enumerate(list(self.active_workers.values())):
-                try:
-                    if not worker.wait(3000):  # Wait max 3 seconds per thread
-                        print(f"[TaskManager] Worker {i} timeout during wait")
-                except Exception as e:
-                    print(f"[TaskManager] Error waiting for worker: {e}")
-            
+                worker.is_running = False
+            for stream in list(self.streams):
+                stream.stopped = True
+            self.engine.stop()
             self.active_workers.clear()
-            print("[TaskManager] All workers stopped")
+            self._handles.clear()
+            print("[TaskManager] All tasks stopped")
         except Exception as e:
             print(f"[TaskManager] Error in stop_all_workers: {e}")
 
@@ -0,0 +1,203 @@
+"""
+Benchmark - End-to-end throughput of the task pipeline against the mock server
+
+    python -m tools.benchmark --tasks 1,10,100,1000 --latency lognormal:5,0.3
+
+For each task count a fresh TaskEngine (the engine behind TaskManager,
+without Qt) submits every task through ApiClient, polls and downloads the
+results from a local MockGrsaiServer, and reports:
+
+    throughput      finished tasks per second of wall time
+    p50/p95/p99     end-to-end latency from submit() to the first saved image
+    cpu             process CPU seconds and share of one core
+    peak rss        peak resident memory of the process
+
+Each run caps in-flight tasks at its --concurrency (the AIMD ceiling
+included) and rate-limits requests only when --rate is given, so the rows
+measure the pipeline rather than the app's default limits.
+
+The run happens in a scratch directory with its own config, history and
+output folder, so the real history is never touched. Config keys can be
+overridden with --set key=value (e.g. --set poll_max_rate=50).
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if unknown"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    return None
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def run_once(count, concurrency, model, size, timeout, rate):
+    """Run `count` tasks through a fresh engine; returns a result dict"""
+    from core.engine import Job, TaskEngine
+    from core.rate_limit import AimdController, rate_limiter
+    from core.scheduler import JobScheduler
+
+    # Sized to the run, not to max_concurrent_tasks / api_rate_limit, and
+    # starting clean so one run's throttling does not carry into the next
+    rate_limiter.reset(rate=rate, controller=AimdController(maximum=float(concurrency)))
+    engine = TaskEngine(scheduler=JobScheduler(max_concurrent=concurrency, controller=rate_limiter.controller))
+    lock = threading.Lock()
+    all_done = threading.Event()
+    latencies = []
+    outcome = {"succeeded": 0, "failed": 0, "done": 0}
+    started = {}
+
+    def on_finished(job, success, result, reason):
+        with lock:
+            if success:
+                outcome["succeeded"] += 1
+                latencies.append(time.perf_counter() - started[job.id])
+            else:
+                outcome["failed"] += 1
+
+    def on_done(job):
+        with lock:
+            outcome["done"] += 1
+            if outcome["done"] == count:
+                all_done.set()
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for index in range(count):
+        job = Job(f"benchmark task {index}", model, "1:1", size, [])
+        job.on_finished = on_finished
+        job.on_done = on_done
+        started[job.id] = time.perf_counter()
+        engine.submit(job)
+    finished = all_done.wait(timeout)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    engine.stop()
+
+    return {
+        "tasks": count,
+        "concurrency": concurrency,
+        "completed": finished,
+        "succeeded": outcome["succeeded"],
+        "failed": outcome["failed"],
+        "wall_s": wall,
+        "throughput_per_s": outcome["done"] / wall if wall > 0 else 0.0,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "cpu_s": cpu,
+        "cpu_pct": cpu / wall * 100 if wall > 0 else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def _fmt(value, unit="", digits=2):
+    return "n/a" if value is None else f"{value:.{digits}f}{unit}"
+
+
+def print_row(row, server_stats):
+    print(f"[Benchmark] {row['tasks']:>5} tasks @ {row['concurrency']:>4} concurrent | "
+          f"{row['succeeded']} ok / {row['failed']} failed{'' if row['completed'] else ' (TIMED OUT)'} | "
+          f"{_fmt(row['throughput_per_s'], '/s')} | "
+          f"p50 {_fmt(row['p50_s'], 's')} p95 {_fmt(row['p95_s'], 's')} p99 {_fmt(row['p99_s'], 's')} | "
+          f"cpu {_fmt(row['cpu_s'], 's')} ({_fmt(row['cpu_pct'], '%', 0)}) | "
+          f"peak rss {_fmt(row['peak_rss_mb'], ' MB', 1)} | "
+          f"{server_stats['result']} polls, {server_stats['throttled']} throttled")
+
+
+def main(argv=None):
+    from tools.mock_server import MockGrsaiServer, MockProfile
+
+    parser = argparse.ArgumentParser(prog="python -m tools.benchmark",
+                                     description="Measure task pipeline throughput against a local mock server.")
+    parser.add_argument("--tasks", default="1,10,100,1000", help="comma-separated task counts (1-1000)")
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="tasks in flight at once (default: the task count, i.e. everything in flight)")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="client request rate limit in req/s (default: 0, unlimited; "
+                             "use --max-rps to model the server's limit)")
+    parser.add_argument("--model", default="nano-banana")
+    parser.add_argument("--size", default="1K")
+    parser.add_argument("--timeout", type=float, default=600.0, help="seconds to wait per run")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a config value for the run (JSON value), repeatable")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    MockProfile.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    counts = [int(n) for n in args.tasks.split(",") if n.strip()]
+    if any(not 1 <= n <= 1000 for n in counts):
+        parser.error("task counts must be between 1 and 1000")
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    server = MockGrsaiServer(profile=MockProfile.from_args(args)).start()
+    scratch = tempfile.TemporaryDirectory(prefix="grsai-bench-", ignore_cleanup_errors=True)
+    # core modules keep config/history next to the working directory
+    os.chdir(scratch.name)
+    from core.config import cfg
+    cfg.data.update({"api_base_url": server.url, "api_key": "benchmark",
+                     "output_folder": os.path.join(scratch.name, "output")})
+    for override in args.set:
+        key, _, value = override.partition("=")
+        try:
+            cfg.data[key] = json.loads(value)
+        except ValueError:
+            cfg.data[key] = value
+
+    print(f"[Benchmark] Mock server {server.url}, latency {args.latency}, "
+          f"failure rate {args.failure_rate}, image {args.image_kb} KB")
+    rows = []
+    try:
+        for count in counts:
+            before = server.get_stats()
+            row = run_once(count, args.concurrency or count, args.model, args.size, args.timeout, args.rate)
+            after = server.get_stats()
+            stats = {key: after[key] - before[key] for key in ("submit", "result", "throttled", "not_ready")}
+            row["server"] = stats
+            rows.append(row)
+            print_row(row, stats)
+    finally:
+        from core.history_manager import history_mgr
+        history_mgr.flush()
+        server.stop()
+        scratch.cleanup()
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        print(f"[Benchmark] Results written to {json_path}")
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, ROOT)
+    main()
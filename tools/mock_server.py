@@ -0,0 +1,306 @@
+"""
+Mock Server - Local stand-in for the Grsai draw API
+
+    python -m tools.mock_server --port 8765 --latency lognormal:20,0.4 --failure-rate 0.05
+
+Implements the three endpoints the client uses:
+
+    POST /v1/draw/nano-banana   submit, returns {"code": 0, "data": {"id": ...}}
+    POST /v1/draw/completions   same, honours "variants"
+    POST /v1/draw/result        running / succeeded / failed, or -22 while not ready
+
+plus GET /files/<name> for the generated images and GET /stats for request
+counters. Generation time is drawn per task from a latency distribution and
+progress follows a configurable curve. Failures, -22 responses, throttling
+(HTTP 429 with Retry-After) and the image payload size can all be tuned, so
+the task pipeline can be benchmarked and regression-tested without spending
+credits. Point api_base_url at http://127.0.0.1:<port> to use it from the app.
+Only the standard library is used.
+"""
+import argparse
+import itertools
+import json
+import math
+import random
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+PROGRESS_CURVES = {
+    "linear": lambda x: x,
+    "ease-in": lambda x: x * x,
+    "ease-out": lambda x: 1 - (1 - x) ** 2,
+    "step": lambda x: math.floor(x * 4) / 4,
+}
+
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def make_png(size_kb):
+    """A real, decodable RGB noise PNG of roughly size_kb (noise does not compress)"""
+    side = max(1, int(math.sqrt(size_kb * 1024 / 3)))
+    noise = random.Random(side).randbytes(side * side * 3)
+    row = side * 3
+    raw = b"".join(b"\0" + noise[y * row:(y + 1) * row] for y in range(side))  # filter type 0 per row
+    header = struct.pack(">IIBBBBB", side, side, 8, 2, 0, 0, 0)
+    return (PNG_SIGNATURE + _png_chunk(b"IHDR", header)
+            + _png_chunk(b"IDAT", zlib.compress(raw, 1)) + _png_chunk(b"IEND", b""))
+
+
+def parse_distribution(spec):
+    """Sampler for "fixed:S", "uniform:A,B", "normal:MEAN,SD", "lognormal:MEDIAN,SIGMA" or "exp:MEAN" (seconds)"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v.strip()] if args else []
+    if kind == "fixed" and len(values) == 1:
+        return lambda: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "normal" and len(values) == 2:
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == "lognormal" and len(values) == 2:
+        return lambda: random.lognormvariate(math.log(values[0]), values[1])
+    if kind == "exp" and len(values) == 1:
+        return lambda: random.expovariate(1.0 / values[0])
+    raise ValueError(f"unknown latency distribution: {spec}")
+
+
+class MockProfile:
+    """Behaviour knobs for the mock server"""
+
+    def __init__(self, latency="lognormal:10,0.3", progress_curve="linear", register_delay=0.0,
+                 not_ready_rate=0.0, failure_rate=0.0, failure_reason="error", max_rps=0.0,
+                 throttle_rate=0.0, retry_after=1.0, image_kb=512, rtt_ms=0.0):
+        self.latency = latency
+        self.sample_latency = parse_distribution(latency)
+        if progress_curve not in PROGRESS_CURVES:
+            raise ValueError(f"unknown progress curve: {progress_curve}")
+        self.progress_curve = progress_curve
+        self.register_delay = register_delay      # seconds a new task answers -22
+        self.not_ready_rate = not_ready_rate      # chance a poll of a running task answers -22
+        self.failure_rate = failure_rate          # chance a task ends as failed
+        self.failure_reason = failure_reason
+        self.max_rps = max_rps                    # API requests/s before 429 (0 = no limit)
+        self.throttle_rate = throttle_rate        # chance any API request gets a 429
+        self.retry_after = retry_after
+        self.image_kb = image_kb
+        self.rtt_ms = rtt_ms                      # added to every response
+
+    @classmethod
+    def add_arguments(cls, parser):
+        parser.add_argument("--latency", default="lognormal:10,0.3",
+                            help="generation time distribution in seconds, e.g. fixed:5, uniform:5,20, "
+                                 "normal:20,5, lognormal:20,0.4, exp:15")
+        parser.add_argument("--progress-curve", default="linear", choices=sorted(PROGRESS_CURVES))
+        parser.add_argument("--register-delay", type=float, default=0.0,
+                            help="seconds after submission during which result polls return -22")
+        parser.add_argument("--not-ready-rate", type=float, default=0.0,
+                            help="fraction of polls on running tasks that return -22")
+        parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of tasks that fail")
+        parser.add_argument("--failure-reason", default="error",
+                            help="failure_reason of failed tasks (e.g. output_moderation)")
+        parser.add_argument("--max-rps", type=float, default=0.0,
+                            help="API requests per second before answering 429 (0 = unlimited)")
+        parser.add_argument("--throttle-rate", type=float, default=0.0,
+                            help="fraction of API requests answered with 429 regardless of rate")
+        parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429")
+        parser.add_argument("--image-kb", type=int, default=512, help="size of each generated image (a decodable noise PNG)")
+        parser.add_argument("--rtt-ms", type=float, default=0.0, help="delay added to every response")
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(args.latency, args.progress_curve, args.register_delay, args.not_ready_rate,
+                   args.failure_rate, args.failure_reason, args.max_rps, args.throttle_rate,
+                   args.retry_after, args.image_kb, args.rtt_ms)
+
+
+class _MockTask:
+    __slots__ = ("id", "created", "duration", "fails", "variants")
+
+    def __init__(self, task_id, duration, fails, variants):
+        self.id = task_id
+        self.created = time.monotonic()
+        self.duration = duration
+        self.fails = fails
+        self.variants = variants
+
+
+class MockGrsaiServer:
+    """Threaded HTTP server holding the simulated tasks"""
+
+    def __init__(self, host="127.0.0.1", port=0, profile=None):
+        self.profile = profile or MockProfile()
+        self._tasks = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._tokens = None
+        self._updated = time.monotonic()
+        self._image = make_png(self.profile.image_kb)
+        self.stats = {"submit": 0, "result": 0, "not_ready": 0, "throttled": 0, "files": 0,
+                      "bytes_sent": 0, "succeeded": 0, "failed": 0}
+        handler = type("Handler", (_Handler,), {"server_state": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve on a background thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-grsai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, tasks=len(self._tasks))
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    # ---- behaviour -------------------------------------------------------
+
+    def throttle_wait(self):
+        """Seconds the caller must wait, or 0 if the request may proceed"""
+        profile = self.profile
+        if profile.throttle_rate and random.random() < profile.throttle_rate:
+            return profile.retry_after
+        if profile.max_rps <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            if self._tokens is None:
+                self._tokens = profile.max_rps
+            self._tokens = min(self._tokens + (now - self._updated) * profile.max_rps, profile.max_rps)
+            self._updated = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            return max(profile.retry_after, (1.0 - self._tokens) / profile.max_rps)
+
+    def submit(self, body):
+        variants = body.get("variants", 1) if isinstance(body.get("variants"), int) else 1
+        task = _MockTask(f"mock-{next(self._ids)}", self.profile.sample_latency(),
+                         random.random() < self.profile.failure_rate, max(1, min(variants, 4)))
+        with self._lock:
+            self._tasks[task.id] = task
+            self.stats["submit"] += 1
+        return {"code": 0, "msg": "success", "data": {"id": task.id}}
+
+    def result(self, body):
+        self._count("result")
+        with self._lock:
+            task = self._tasks.get(body.get("id"))
+        now = time.monotonic()
+        profile = self.profile
+        if task is None or now - task.created < profile.register_delay:
+            self._count("not_ready")
+            return {"code": -22, "msg": "task not found"}
+        elapsed = now - task.created
+        if elapsed < task.duration:
+            if profile.not_ready_rate and random.random() < profile.not_ready_rate:
+                self._count("not_ready")
+                return {"code": -22, "msg": "task not ready"}
+            progress = int(PROGRESS_CURVES[profile.progress_curve](elapsed / task.duration) * 100)
+            return {"code": 0, "msg": "success",
+                    "data": {"id": task.id, "status": "running", "progress": min(progress, 99)}}
+        if task.fails:
+            self._count("failed")
+            return {"code": 0, "msg": "success",
+                    "data": {"id": task.id, "status": "failed", "progress": 100,
+                             "failure_reason": profile.failure_reason, "error": "mock failure"}}
+        self._count("succeeded")
+        results = [{"url": f"{self.url}/files/{task.id}_{n}.png", "content": ""} for n in range(task.variants)]
+        return {"code": 0, "msg": "success",
+                "data": {"id": task.id, "status": "succeeded", "progress": 100, "results": results}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    server_state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, content_type="application/json", headers=None):
+        if self.server_state.profile.rtt_ms:
+            time.sleep(self.server_state.profile.rtt_ms / 1000)
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server_state._count("bytes_sent", len(data))
+
+    def do_POST(self):
+        state = self.server_state
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send(400, {"code": -1, "msg": "invalid json"})
+            return
+        if self.path not in ("/v1/draw/nano-banana", "/v1/draw/completions", "/v1/draw/result"):
+            self._send(404, {"code": -1, "msg": "not found"})
+            return
+        wait = state.throttle_wait()
+        if wait:
+            state._count("throttled")
+            self._send(429, {"code": -1, "msg": "too many requests"},
+                       headers={"Retry-After": str(max(1, math.ceil(wait)))})
+            return
+        if self.path == "/v1/draw/result":
+            self._send(200, state.result(body))
+        else:
+            self._send(200, state.submit(body))
+
+    def do_GET(self):
+        state = self.server_state
+        if self.path.startswith("/files/"):
+            state._count("files")
+            self._send(200, state._image, content_type="image/png")
+        elif self.path == "/stats":
+            self._send(200, state.get_stats())
+        else:
+            self._send(404, {"code": -1, "msg": "not found"})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tools.mock_server",
+                                     description="Local stand-in for the Grsai draw API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    MockProfile.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = MockGrsaiServer(args.host, args.port, MockProfile.from_args(args))
+    print(f"[MockServer] Serving on {server.url} (latency {args.latency}), Ctrl+C to stop")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"[MockServer] {server.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
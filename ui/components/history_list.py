@@ -0,0 +1,316 @@
+"""
+History List - Virtualized model/view rendering of the history store
+
+HistoryListModel pages records in from history_mgr in batches as the view
+scrolls (canFetchMore/fetchMore), and HistoryItemDelegate paints each row as
+a card, so only visible rows cost anything. Thumbnails are requested from
+the image loader the first time a row is painted and kept in a small LRU.
+Changes reported by history_mgr are applied as row inserts, updates and
+removals instead of reloading.
+"""
+from collections import OrderedDict
+
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QSize, QEvent, Signal
+from PySide6.QtGui import QColor, QFont, QFontMetrics, QPainter, QPainterPath, QPixmap
+from PySide6.QtWidgets import QStyledItemDelegate, QStyle
+from qfluentwidgets import FluentIcon, getFont, isDarkTheme
+
+from core.history_manager import history_mgr
+from core.history_store import record_matches
+from ui.components.thumbnail_cache import HISTORY_THUMB_SIZE
+from ui.components.image_loader import image_loader
+
+# Decoded thumbnails kept for scrolled-past rows (~120 KB each)
+THUMB_LRU_SIZE = 256
+# Queued decodes beyond this are cancelled oldest first (rows flung past while scrolling)
+MAX_PENDING_THUMBS = 32
+
+ROW_HEIGHT = 130
+CARD_MARGIN_H = 20
+CARD_MARGIN_V = 5
+CARD_PADDING = 16
+THUMB_EDGE = 88
+STATUS_COLORS = {"succeeded": "green", "failed": "red"}
+
+
+class HistoryListModel(QAbstractListModel):
+    """History records (newest first) matching the current filters, fetched on demand"""
+
+    TaskRole = Qt.UserRole + 1
+    ThumbnailRole = Qt.UserRole + 2
+
+    # history_mgr listener (any thread) -> GUI thread
+    historyChanged = Signal(str, str, object, object)
+    totalChanged = Signal(int)
+
+    def __init__(self, batch_size=100, parent=None):
+        super().__init__(parent)
+        self.batch_size = max(1, batch_size)
+        self.filters = {}
+        self.total = 0
+        self.rows = []
+        self._thumbs = OrderedDict()  # result path -> QPixmap (null = undecodable)
+        self._pending = OrderedDict()  # result path -> image loader request id
+        self.historyChanged.connect(self._on_history_changed)
+        self._listener = self.historyChanged.emit
+        history_mgr.add_listener(self._listener)
+        self.destroyed.connect(lambda *_: history_mgr.remove_listener(self._listener))
+
+    def reload(self, filters=None):
+        """Drop fetched rows and start over (optionally with new filters)"""
+        if filters is not None:
+            self.filters = filters
+        self.beginResetModel()
+        self.rows = []
+        for request_id in self._pending.values():
+            image_loader.cancel(request_id)
+        self._pending.clear()
+        self.total = history_mgr.count_tasks(**self.filters)
+        self.endResetModel()
+        self.totalChanged.emit(self.total)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and len(self.rows) < self.total
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        start = len(self.rows)
+        batch = history_mgr.get_tasks(start, self.batch_size, **self.filters)
+        if not batch:
+            # Store shrank underneath us; stop asking for more
+            self.total = start
+            self.totalChanged.emit(self.total)
+            return
+        # Live-inserted rows may already be present; the store has shifted by as many
+        known = {task["id"] for task in self.rows}
+        batch = [task for task in batch if task["id"] not in known]
+        if not batch:
+            return
+        self.beginInsertRows(QModelIndex(), start, start + len(batch) - 1)
+        self.rows.extend(batch)
+        self.endInsertRows()
+
+    def _find_row(self, key, value):
+        # New and changing records sit near the top, so a scan from there is short
+        for row, task in enumerate(self.rows):
+            if task.get(key) == value:
+                return row
+        return None
+
+    def _on_history_changed(self, change, task_id, task, previous):
+        row = self._find_row("id", task_id)
+        matches = task is not None and record_matches(task, **self.filters)
+        matched = previous is not None and record_matches(previous, **self.filters)
+        if row is not None and not matches:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.rows[row]
+            self.endRemoveRows()
+            self.total -= 1
+        elif row is not None:
+            self.rows[row] = task
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+            return
+        elif matches and change == "added":
+            self.beginInsertRows(QModelIndex(), 0, 0)
+            self.rows.insert(0, task)
+            self.endInsertRows()
+            self.total += 1
+        elif matches and not matched:
+            # Became visible under the filters (e.g. finished while filtering by
+            # status). Only show it if it sorts among the fetched rows; older
+            # records are picked up by fetchMore at their place in the store.
+            position = next((i for i, t in enumerate(self.rows)
+                             if (t.get("created_at") or "") < (task.get("created_at") or "")), None)
+            self.total += 1
+            if position is not None:
+                self.beginInsertRows(QModelIndex(), position, position)
+                self.rows.insert(position, task)
+                self.endInsertRows()
+        elif matched and not matches:
+            # Left the filters (or was removed) before it was fetched
+            self.total -= 1
+        else:
+            return
+        self.totalChanged.emit(self.total)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.rows):
+            return None
+        task = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return task["prompt"]
+        if role == self.TaskRole:
+            return task
+        if role == self.ThumbnailRole:
+            return self._thumbnail(task)
+        return None
+
+    def _thumbnail(self, task):
+        """Cached pixmap for task, or None while it is (being) decoded"""
+        path = task.get("result_path")
+        if task["status"] != "succeeded" or not path:
+            return QPixmap()
+        pixmap = self._thumbs.get(path)
+        if pixmap is not None:
+            self._thumbs.move_to_end(path)
+            return pixmap
+        if path not in self._pending:
+            self._pending[path] = image_loader.request(
+                self, path, HISTORY_THUMB_SIZE, lambda image, path=path: self._on_thumbnail(path, image))
+            while len(self._pending) > MAX_PENDING_THUMBS:
+                _, request_id = self._pending.popitem(last=False)
+                image_loader.cancel(request_id)
+        return None
+
+    def _on_thumbnail(self, path, image):
+        self._pending.pop(path, None)
+        self._thumbs[path] = QPixmap.fromImage(image)
+        while len(self._thumbs) > THUMB_LRU_SIZE:
+            self._thumbs.popitem(last=False)
+        row = self._find_row("result_path", path)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [self.ThumbnailRole])
+
+
+class HistoryItemDelegate(QStyledItemDelegate):
+    """Paints a history record as a card and turns clicks into signals"""
+
+    detailsRequested = Signal(dict)
+    imageRequested = Signal(dict)
+    regenerateRequested = Signal(dict)
+    folderRequested = Signal(dict)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.title_font = getFont(14, QFont.DemiBold)
+        self.body_font = getFont(14)
+        self.caption_font = getFont(12)
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), ROW_HEIGHT)
+
+    def _layout(self, rect, task):
+        """Rects of the card and its clickable parts within the row rect"""
+        card = rect.adjusted(CARD_MARGIN_H, CARD_MARGIN_V, -CARD_MARGIN_H, -CARD_MARGIN_V)
+        inner = card.adjusted(CARD_PADDING, CARD_PADDING, -CARD_PADDING, -CARD_PADDING)
+        thumb = QRect(inner.left(), inner.top() + (inner.height() - THUMB_EDGE) // 2, THUMB_EDGE, THUMB_EDGE)
+
+        metrics = QFontMetrics(self.body_font)
+        buttons = []
+        if task["status"] == "succeeded" and task.get("result_path"):
+            buttons.append(("folder", FluentIcon.FOLDER, "Open Folder"))
+        buttons.append(("regenerate", FluentIcon.SYNC, "Regenerate"))
+        button_rects = {}
+        right = inner.right()
+        for name, icon, text in buttons:
+            width = 16 + 6 + metrics.horizontalAdvance(text) + 12
+            button_rects[name] = (QRect(right - width + 1, inner.bottom() - 31, width, 32), icon, text)
+            right -= width + 5
+
+        text_left = thumb.right() + 1 + 12
+        status = QRect(inner.right() - 160, inner.top(), 161, 24)
+        prompt = QRect(text_left, inner.top(), max(status.left() - text_left - 12, 0), 24)
+        return {"card": card, "thumb": thumb, "prompt": prompt, "status": status,
+                "text_left": text_left, "text_right": right, "buttons": button_rects}
+
+    def paint(self, painter, option, index):
+        task = index.data(HistoryListModel.TaskRole)
+        if task is None:
+            return
+        geo = self._layout(option.rect, task)
+        dark = isDarkTheme()
+        text_color = QColor(255, 255, 255) if dark else QColor(0, 0, 0)
+        sub_color = QColor(255, 255, 255, 160) if dark else QColor(0, 0, 0, 150)
+        hovered = bool(option.state & QStyle.State_MouseOver)
+
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        # Card
+        if dark:
+            fill = QColor(255, 255, 255, 21 if hovered else 13)
+            border = QColor(0, 0, 0, 48)
+        else:
+            fill = QColor(255, 255, 255, 255 if hovered else 180)
+            border = QColor(0, 0, 0, 19)
+        painter.setPen(border)
+        painter.setBrush(fill)
+        painter.drawRoundedRect(geo["card"], 8, 8)
+
+        # Thumbnail (or placeholder while it decodes)
+        thumb = geo["thumb"]
+        clip = QPainterPath()
+        clip.addRoundedRect(thumb, 8, 8)
+        painter.setPen(QColor("#ddd"))
+        painter.setBrush(QColor("#eee"))
+        painter.drawRoundedRect(thumb, 8, 8)
+        pixmap = index.data(HistoryListModel.ThumbnailRole)
+        if pixmap is not None and not pixmap.isNull():
+            painter.save()
+            painter.setClipPath(clip)
+            painter.drawPixmap(thumb, pixmap)
+            painter.restore()
+        elif pixmap is not None:
+            painter.setPen(QColor(0, 0, 0, 150))
+            painter.setFont(self.caption_font)
+            painter.drawText(thumb, Qt.AlignCenter, "No Image")
+
+        # Prompt, model line and date
+        left = geo["text_left"]
+        width = max(geo["text_right"] - left, 0)
+        painter.setFont(self.title_font)
+        painter.setPen(text_color)
+        prompt = QFontMetrics(self.title_font).elidedText(task["prompt"], Qt.ElideRight, geo["prompt"].width())
+        painter.drawText(geo["prompt"], Qt.AlignLeft | Qt.AlignVCenter, prompt)
+        painter.setFont(self.body_font)
+        painter.drawText(QRect(left, geo["prompt"].bottom() + 5, width, 22), Qt.AlignLeft | Qt.AlignVCenter,
+                         f"Model: {task['model']} | Size: {task['image_size']}")
+        painter.setFont(self.caption_font)
+        painter.setPen(sub_color)
+        painter.drawText(QRect(left, geo["prompt"].bottom() + 29, width, 20), Qt.AlignLeft | Qt.AlignVCenter,
+                         task["created_at"])
+
+        # Status and action buttons
+        painter.setFont(self.title_font)
+        painter.setPen(QColor(STATUS_COLORS.get(task["status"], "orange")))
+        painter.drawText(geo["status"], Qt.AlignRight | Qt.AlignVCenter, task["status"].capitalize())
+        painter.setFont(self.body_font)
+        painter.setPen(text_color)
+        for rect, icon, text in geo["buttons"].values():
+            icon.render(painter, QRect(rect.left() + 6, rect.center().y() - 7, 16, 16))
+            painter.drawText(rect.adjusted(28, 0, 0, 0), Qt.AlignLeft | Qt.AlignVCenter, text)
+
+        painter.restore()
+
+    def _hit(self, pos, task, rect):
+        geo = self._layout(rect, task)
+        for name, (button, _, _) in geo["buttons"].items():
+            if button.contains(pos):
+                return name
+        if geo["thumb"].contains(pos) and task["status"] == "succeeded" and task.get("result_path"):
+            return "thumb"
+        if geo["prompt"].contains(pos):
+            return "prompt"
+        return None
+
+    def editorEvent(self, event, model, option, index):
+        task = index.data(HistoryListModel.TaskRole)
+        if task is None:
+            return False
+        if event.type() == QEvent.MouseMove and self.parent() is not None:
+            hit = self._hit(event.position().toPoint(), task, option.rect)
+            self.parent().viewport().setCursor(Qt.PointingHandCursor if hit else Qt.ArrowCursor)
+        elif event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            hit = self._hit(event.position().toPoint(), task, option.rect)
+            signal = {"prompt": self.detailsRequested, "thumb": self.imageRequested,
+                      "regenerate": self.regenerateRequested, "folder": self.folderRequested}.get(hit)
+            if signal is not None:
+                signal.emit(task)
+                return True
+        return super().editorEvent(event, model, option, index)
@@ -3,10 +3,17 @@ from datetime import datetime
 from PySide6.QtCore import Qt, Signal, QSize
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QFileDialog, 
                                QFrame, QSizePolicy, QApplication)
-from PySide6.QtGui import QPixmap, QDragEnterEvent, QDropEvent, QImage, QIcon
+from PySide6.QtGui import QPixmap, QDragEnterEvent, QDropEvent, QImageReader, QImageIOHandler, QIcon
 from qfluentwidgets import (TransparentToolButton, FluentIcon, InfoBar, InfoBarPosition, 
                             SingleDirectionScrollArea, isDarkTheme, StrongBodyLabel, qconfig)
 
+from ui.components.image_loader import image_loader
+
+# Width of the one decoded copy kept per reference; resizes are scaled from it
+# (the label is at most ~400px wide, 2x for high DPI). Height is left unbounded.
+SOURCE_WIDTH = 800
+SOURCE_SIZE = QSize(SOURCE_WIDTH, SOURCE_WIDTH * 8)
+
 class ImageThumbnail(QWidget):
     removed = Signal(str)
 
@@ -16,10 +23,15 @@ class ImageThumbnail(QWidget):
         self.drop_area = drop_area
         self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
         
-        self.image_obj = QImage(path)
-        if not self.image_obj.isNull():
-            self.original_width = self.image_obj.width()
-            self.original_height = self.image_obj.height()
+        # Only the header is read here; pixels are decoded by the image loader
+        reader = QImageReader(path)
+        reader.setAutoTransform(True)
+        source_size = reader.size()
+        if source_size.isValid() and reader.transformation() & QImageIOHandler.TransformationRotate90:
+            source_size.transpose()
+        if source_size.isValid():
+            self.original_width = source_size.width()
+            self.original_height = source_size.height()
             self.aspect_ratio = self.original_width / self.original_height if self.original_height > 0 else 1.0
         else:
             self.original_width = 400
@@ -30,12 +42,13 @@ class ImageThumbnail(QWidget):
         layout.setContentsMargins(0, 0, 0, 0)
         
         self.img_label = QLabel()
-        self.img_label.setScaledContents(True)
+        self.img_label.setAlignment(Qt.AlignCenter)
         self.img_label.setStyleSheet("border-radius: 8px; border: 1px solid #ddd;")
         
-        pixmap = QPixmap(path)
-        if not pixmap.isNull():
-            self.img_label.setPixmap(pixmap)
+        # Mid-size copy is decoded in the background; the framed label is the placeholder
+        self.source = None
+        self.rendered_size = None
+        image_loader.request(self.img_label, path, SOURCE_SIZE, self.set_image, cached=False)
         
         layout.addWidget(self.img_label)
         layout.addStretch()
@@ -47,6 +60,24 @@ class ImageThumbnail(QWidget):
         
         self.update_size()
         
+    def set_image(self, image):
+        if not image.isNull():
+            self.source = image
+            self.rescale()
+
+    def rescale(self):
+        """Scale the mid-size copy to the label (only when its size changed)"""
+        if self.source is None:
+            return
+        dpr = self.devicePixelRatioF()
+        target = self.img_label.size() * dpr
+        if target == self.rendered_size or target.isEmpty():
+            return
+        self.rendered_size = target
+        pixmap = QPixmap.fromImage(self.source.scaled(target, Qt.IgnoreAspectRatio, Qt.SmoothTransformation))
+        pixmap.setDevicePixelRatio(dpr)
+        self.img_label.setPixmap(pixmap)
+
     def update_size(self):
         if self.drop_area and hasattr(self.drop_area, 'width'):
             drop_area_width = self.drop_area.width()
@@ -59,6 +90,7 @@ class ImageThumbnail(QWidget):
         
         self.img_label.setFixedSize(img_width, img_height)
         self.setFixedHeight(img_height)
+        self.rescale()
         
     def on_remove(self):
         self.removed.emit(self.path)
@@ -0,0 +1,125 @@
+"""
+Image Loader - Decodes thumbnails on a QThreadPool instead of the GUI thread
+
+Widgets call image_loader.request(owner, path, size, callback) and show a
+placeholder until callback(QImage) runs on the GUI thread. Requests are
+cancelled automatically when the owner widget is destroyed (e.g. the history
+page is reloaded), so queued decodes for widgets that are gone are skipped
+and results for them are dropped.
+"""
+import itertools
+import threading
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+from PySide6.QtGui import QImage
+
+from core.config import cfg
+from ui.components.thumbnail_cache import thumb_cache, decode_scaled
+
+
+class _DecodeTask(QRunnable):
+    def __init__(self, loader, request_id, path, size, cached):
+        super().__init__()
+        self.loader = loader
+        self.request_id = request_id
+        self.path = path
+        self.size = size
+        self.cached = cached
+
+    def run(self):
+        if not self.loader.is_pending(self.request_id):
+            return
+        try:
+            if self.cached:
+                image = thumb_cache.get(self.path, self.size)
+            else:
+                image = decode_scaled(self.path, self.size)
+        except Exception as e:
+            print(f"[ImageLoader] Failed to decode {self.path}: {e}")
+            image = QImage()
+        self.loader.decoded.emit(self.request_id, image)
+
+
+class ImageLoader(QObject):
+    """Asynchronous scaled image decoding with per-owner cancellation"""
+
+    # Emitted from pool threads; queued to the loader's (GUI) thread
+    decoded = Signal(int, QImage)
+
+    def __init__(self):
+        super().__init__()
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(cfg.get("thumb_decode_workers", 4))
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pending = {}  # request id -> (owner id, callback)
+        self._by_owner = {}  # owner id -> set of request ids
+        self.completed = 0
+        self.cancelled = 0
+        self.decoded.connect(self._on_decoded)
+
+    def request(self, owner, path, size, callback, cached=True):
+        """Decode path to fit within size and call callback(QImage) on the GUI thread.
+
+        cached=True goes through the on-disk thumbnail cache; use False for
+        one-off display copies of files that are not worth persisting.
+        Returns the request id (usable with cancel()).
+        """
+        request_id = next(self._ids)
+        key = id(owner)
+        with self._lock:
+            self._pending[request_id] = (key, callback)
+            if key not in self._by_owner:
+                self._by_owner[key] = set()
+                owner.destroyed.connect(lambda *_: self.cancel_owner(key))
+            self._by_owner[key].add(request_id)
+        self.pool.start(_DecodeTask(self, request_id, path, size, cached))
+        return request_id
+
+    def is_pending(self, request_id):
+        with self._lock:
+            return request_id in self._pending
+
+    def cancel(self, request_id):
+        with self._lock:
+            entry = self._pending.pop(request_id, None)
+            if entry is None:
+                return
+            self.cancelled += 1
+            requests = self._by_owner.get(entry[0])
+            if requests is not None:
+                requests.discard(request_id)
+
+    def cancel_owner(self, key):
+        """Drop every outstanding request of a destroyed owner"""
+        with self._lock:
+            for request_id in self._by_owner.pop(key, ()):
+                if self._pending.pop(request_id, None) is not None:
+                    self.cancelled += 1
+
+    def _on_decoded(self, request_id, image):
+        with self._lock:
+            entry = self._pending.pop(request_id, None)
+            if entry is None:
+                return
+            requests = self._by_owner.get(entry[0])
+            if requests is not None:
+                requests.discard(request_id)
+            self.completed += 1
+        try:
+            entry[1](image)
+        except RuntimeError as e:
+            # Owner's C++ object already gone
+            print(f"[ImageLoader] Dropped result for deleted widget: {e}")
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "threads": self.pool.maxThreadCount(),
+            }
+
+
+image_loader = ImageLoader()
@@ -4,6 +4,10 @@ from PySide6.QtGui import QPixmap, QIcon, QDesktopServices
 from qfluentwidgets import (StrongBodyLabel, BodyLabel, TransparentToolButton, ProgressRing, FluentIcon, isDarkTheme, qconfig)
 
 from core.config import cfg
+from core.retry_policy import retry_policy, DOWNLOAD
+from core.scheduler import PRIORITY_INTERACTIVE
+from ui.components.thumbnail_cache import TASK_THUMB_SIZE
+from ui.components.image_loader import image_loader
 
 class TaskWidget(QFrame):
     retry_requested = Signal(object)
@@ -18,6 +22,11 @@ class TaskWidget(QFrame):
         self.attempt_count = 0
         self.max_retries = cfg.get("max_retries", 5)
         self.auto_retry = False
+        self.class_attempts = {}  # failure class -> auto-retries used
+        # Set after a download-only failure: retries fetch this task's result again
+        self.resume_task_id = None
+        self.priority = PRIORITY_INTERACTIVE
+        self.recovered = False
         self.retry_timer = QTimer()
         self.retry_timer.setSingleShot(True)
         self.retry_timer.timeout.connect(self.perform_auto_retry)
@@ -89,46 +98,76 @@ class TaskWidget(QFrame):
         self.current_status = status
         self.setStyleSheet(f"TaskWidget {{ border: {border}; border-radius: 8px; background-color: {bg_color}; }}")
 
+    def mark_recovered(self, task_id, priority):
+        """Resume a task an earlier session left running instead of submitting it"""
+        self.recovered = True
+        self.resume_task_id = task_id
+        self.priority = priority
+        self.index_label.setToolTip("Recovered from the previous session")
+        self.status_label.setText("Recovered: waiting for result...")
+
+    def set_queued(self, position, waited):
+        self.status_label.setText(f"Attempt {self.attempt_count + 1}: Queued #{position} ({int(waited)}s)")
+        self.progress_ring.setToolTip(f"Waiting for a free slot, {int(waited)}s so far")
+
+    def set_started(self):
+        self.status_label.setText(f"Attempt {self.attempt_count + 1}: Starting...")
+        self.progress_ring.setToolTip("Status: Starting")
+
     def update_progress(self, value, status):
         self.status_stack.setCurrentIndex(0)
         self.progress_ring.setValue(value)
         self.status_text = status
-        self.status_label.setText(f"Attempt {self.attempt_count + 1}: {status}")
+        label = "Recovered" if self.recovered and self.attempt_count == 0 else f"Attempt {self.attempt_count + 1}"
+        self.status_label.setText(f"{label}: {status}")
         self.progress_ring.setToolTip(f"Status: {status}")
         
     def set_success(self, filepath):
         self.result_path = filepath
         self.status_stack.setCurrentIndex(1)
         
-        if self.attempt_count == 0:
+        if self.recovered and self.attempt_count == 0:
+            self.status_label.setText("✓ Recovered from previous session")
+        elif self.attempt_count == 0:
             self.status_label.setText("✓ Success on 1st attempt")
         elif self.attempt_count == 1:
             self.status_label.setText("✓ Success on retry 1")
         else:
             self.status_label.setText(f"✓ Success on retry {self.attempt_count}")
         
-        pixmap = QPixmap(filepath)
-        if not pixmap.isNull():
-            icon = QIcon(pixmap)
-            self.result_btn.setIcon(icon)
+        image_loader.request(self.result_btn, filepath, TASK_THUMB_SIZE, self.set_result_icon)
         
         self.result_btn.setContextMenuPolicy(Qt.CustomContextMenu)
         self.result_btn.customContextMenuRequested.connect(self.show_result_menu)
             
         self.update_style("success")
 
-    def set_failed(self, reason):
+    def set_result_icon(self, image):
+        if not image.isNull():
+            self.result_btn.setIcon(QIcon(QPixmap.fromImage(image)))
+
+    def set_failed(self, reason, failure_class=None, task_id=None):
         try:
+            self.resume_task_id = task_id if failure_class == DOWNLOAD else None
             self.status_stack.setCurrentIndex(2)
             self.retry_btn.setToolTip(f"Failed: {reason}. Click to retry.")
             self.status_label.setText(f"✗ Failed: {reason}")
             self.update_style("failed")
             
             if self.auto_retry and self.retry_count < self.max_retries:
-                print(f"[TaskWidget] Auto-retrying... ({self.retry_count + 1}/{self.max_retries})")
+                # Backoff and budget depend on what kind of failure this was
+                attempt = self.class_attempts.get(failure_class, 0)
+                delay = retry_policy.delay(failure_class, attempt)
+                if delay is None:
+                    print(f"[TaskWidget] Retry budget for {failure_class} failures used up")
+                    return
+                print(f"[TaskWidget] Auto-retrying {failure_class} failure in {delay:.1f}s... "
+                      f"({self.retry_count + 1}/{self.max_retries})")
+                self.class_attempts[failure_class] = attempt + 1
                 self.retry_count += 1
                 self.attempt_count += 1
-                self.retry_timer.start(1000)
+                self.status_label.setText(f"✗ Failed: {reason} (retrying in {delay:.0f}s)")
+                self.retry_timer.start(int(delay * 1000))
         except Exception as e:
             print(f"[TaskWidget] Error in set_failed: {e}")
     
@@ -144,6 +183,8 @@ class TaskWidget(QFrame):
         self.retry_btn.hide()
         self.retry_count += 1
         self.attempt_count += 1
+        # A manual retry is interactive even for recovered tasks
+        self.priority = PRIORITY_INTERACTIVE
         self.status_label.setText(f"Attempt {self.attempt_count + 1}: Retrying...")
         self.retry_requested.emit(self)
 
@@ -161,6 +202,62 @@ class TaskWidget(QFrame):
     def regenerate(self):
         self.regenerate_requested.emit(self)
 
+class MatrixRunWidget(QFrame):
+    """Single card summarising a prompt matrix sweep fed through a JobStream"""
+    stop_requested = Signal()
+
+    def __init__(self, index, template, total, parent=None):
+        super().__init__(parent)
+        self.template = template
+        self.total = total
+        self.stopping = False
+        self.setFixedHeight(120)
+        self.update_style()
+        qconfig.themeChanged.connect(self.update_style)
+
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(10, 10, 10, 10)
+        layout.setSpacing(15)
+
+        self.index_label = StrongBodyLabel(f"#{index}")
+        self.index_label.setFixedWidth(40)
+        self.index_label.setToolTip(template)
+        layout.addWidget(self.index_label)
+
+        self.status_label = BodyLabel(f"Matrix: 0/{total} jobs")
+        self.status_label.setWordWrap(True)
+        layout.addWidget(self.status_label, 1)
+
+        self.progress_ring = ProgressRing()
+        self.progress_ring.setFixedSize(50, 50)
+        self.progress_ring.setTextVisible(True)
+        layout.addWidget(self.progress_ring)
+
+        self.stop_btn = TransparentToolButton(FluentIcon.CLOSE, self)
+        self.stop_btn.setToolTip("Stop the remaining jobs")
+        self.stop_btn.clicked.connect(self.on_stop_click)
+        layout.addWidget(self.stop_btn)
+
+    def update_style(self):
+        bg_color = "rgba(255, 255, 255, 0.05)" if isDarkTheme() else "rgba(0, 0, 0, 0.1)"
+        self.setStyleSheet(f"MatrixRunWidget {{ border: 1px solid #e0e0e0; border-radius: 8px; background-color: {bg_color}; }}")
+
+    def update_progress(self, done, succeeded, failed):
+        self.progress_ring.setValue(int(done * 100 / self.total) if self.total else 100)
+        self.status_label.setText(f"Matrix: {done}/{self.total} jobs ({succeeded} ✓, {failed} ✗)")
+
+    def on_stop_click(self):
+        self.stopping = True
+        self.stop_btn.setEnabled(False)
+        self.status_label.setText(self.status_label.text() + " - stopping...")
+        self.stop_requested.emit()
+
+    def set_finished(self):
+        self.stop_btn.hide()
+        text = self.status_label.text().replace(" - stopping...", "")
+        self.status_label.setText(("■ Stopped: " if self.stopping else "✓ ") + text)
+
+
 class TaskListWidget(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
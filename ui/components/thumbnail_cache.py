@@ -0,0 +1,161 @@
+"""
+Thumbnail Cache - Pre-scaled thumbnails of result images kept on disk
+
+Decoding a 4K PNG just to show an 88px preview takes tens of milliseconds.
+Thumbnails are generated once per (file, mtime, size, target size) and stored
+under cache/thumbs, so later views - including after a restart - only read a
+small file. The directory is capped by total size and evicted least recently
+used first (file mtime is bumped on every hit).
+"""
+import hashlib
+import os
+import threading
+import time
+
+from PySide6.QtCore import Qt, QSize
+from PySide6.QtGui import QImage, QImageReader, QImageWriter
+
+from core.config import cfg
+
+CACHE_DIR = os.path.join(os.getcwd(), "cache", "thumbs")
+
+# Thumbnail sizes used by the UI (2x the displayed size for high DPI)
+HISTORY_THUMB_SIZE = QSize(176, 176)
+TASK_THUMB_SIZE = QSize(80, 80)
+
+
+def decode_scaled(path, size):
+    """Decode path scaled down to fit within size (never upscaled)"""
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    source = reader.size()
+    if source.isValid() and (source.width() > size.width() or source.height() > size.height()):
+        # Let the decoder scale (JPEG decodes at reduced resolution directly)
+        reader.setScaledSize(source.scaled(size, Qt.KeepAspectRatio))
+    return reader.read()
+
+
+class ThumbnailCache:
+    """Disk-backed LRU of scaled QImages keyed by source path + mtime + size"""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=None):
+        self.cache_dir = cache_dir
+        self._max_bytes = max_bytes
+        self._entries = None  # file name -> [bytes, last used]; scanned lazily
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._fmt = None
+
+    @property
+    def fmt(self):
+        # Resolved on first use: image plugins are only reliable once the app exists
+        if self._fmt is None:
+            formats = {bytes(f).decode() for f in QImageWriter.supportedImageFormats()}
+            self._fmt = "webp" if "webp" in formats else "png"
+        return self._fmt
+
+    @property
+    def max_bytes(self):
+        if self._max_bytes is not None:
+            return self._max_bytes
+        return int(cfg.get("thumb_cache_max_mb", 128) * 1024 * 1024)
+
+    def _key(self, path, size):
+        st = os.stat(path)
+        raw = f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}|{size.width()}x{size.height()}"
+        return f"{hashlib.sha1(raw.encode('utf-8')).hexdigest()}.{self.fmt}"
+
+    def _scan(self):
+        """Build the index from the cache directory (first use only)"""
+        self._entries = {}
+        self._size = 0
+        if not os.path.isdir(self.cache_dir):
+            return
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                st = entry.stat()
+                self._entries[entry.name] = [st.st_size, st.st_mtime]
+                self._size += st.st_size
+
+    def get(self, path, size):
+        """Scaled QImage of path fitting within size (aspect kept), or a null QImage"""
+        try:
+            name = self._key(path, size)
+        except OSError:
+            return QImage()
+        cached = os.path.join(self.cache_dir, name)
+
+        with self._lock:
+            if self._entries is None:
+                self._scan()
+            entry = self._entries.get(name)
+        if entry is not None:
+            image = QImage(cached)
+            if not image.isNull():
+                self._touch(name, cached)
+                return image
+
+        with self._lock:
+            self.misses += 1
+        image = decode_scaled(path, size)
+        if not image.isNull():
+            self._store(name, cached, image)
+        return image
+
+    def _touch(self, name, cached):
+        try:
+            os.utime(cached)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+            entry = self._entries.get(name)
+            if entry is not None:
+                entry[1] = time.time()
+
+    def _store(self, name, cached, image):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{cached}.{threading.get_ident()}.tmp"
+        if not image.save(tmp_path, self.fmt.upper()):
+            print(f"[ThumbnailCache] Failed to write thumbnail {cached}")
+            return
+        os.replace(tmp_path, cached)
+        st = os.stat(cached)
+        with self._lock:
+            old = self._entries.pop(name, None)
+            if old is not None:
+                self._size -= old[0]
+            self._entries[name] = [st.st_size, st.st_mtime]
+            self._size += st.st_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used thumbnails until under 90% of the budget"""
+        target = self.max_bytes * 0.9
+        for name, (nbytes, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if self._size <= target:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            del self._entries[name]
+            self._size -= nbytes
+            self.evictions += 1
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries or {}),
+                "bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+thumb_cache = ThumbnailCache()
@@ -3,14 +3,17 @@ from datetime import datetime
 from PySide6.QtCore import Qt, QSize
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QSizePolicy, QScrollArea, QApplication)
 from qfluentwidgets import (CardWidget, PrimaryPushButton, ComboBox, CaptionLabel, 
-                            InfoBar, InfoBarPosition, SegmentedWidget, CheckBox, Slider,
+                            InfoBar, InfoBarPosition, SegmentedWidget, CheckBox, Slider, MessageBox,
                             TransparentToolButton, FluentIcon, StrongBodyLabel, BodyLabel, isDarkTheme, qconfig)
 
 from core.config import cfg
+from core import prompt_matrix
 from core.task_manager import task_manager
+from core.scheduler import PRIORITY_BACKGROUND
+from core.ref_preprocess import ref_preprocessor
 from ui.components.prompt_widget import PromptWidget
 from ui.components.image_drop_area import ImageDropArea
-from ui.components.task_widget import TaskWidget, TaskListWidget
+from ui.components.task_widget import TaskWidget, TaskListWidget, MatrixRunWidget
 
 class GeneratorPage(QWidget):
     def __init__(self):
@@ -125,6 +128,26 @@ class GeneratorPage(QWidget):
         retry_parallel_layout.addWidget(self.parallel_value_label)
         
         settings_inner.addLayout(retry_parallel_layout)
+
+        # Prompt Matrix: {a|b|c} lists in the prompt, optionally swept over ratios/sizes
+        matrix_layout = QHBoxLayout()
+
+        self.matrix_cb = CheckBox("Prompt Matrix")
+        self.matrix_cb.setToolTip("Expand {a|b|c} lists in the prompt into one job per combination")
+        self.matrix_cb.setChecked(cfg.get("prompt_matrix_enabled", False))
+        self.matrix_cb.stateChanged.connect(self.update_matrix_options)
+        matrix_layout.addWidget(self.matrix_cb)
+
+        self.sweep_ratios_cb = CheckBox("All Aspect Ratios")
+        self.sweep_ratios_cb.setToolTip("Run every combination in each aspect ratio")
+        matrix_layout.addWidget(self.sweep_ratios_cb)
+
+        self.sweep_sizes_cb = CheckBox("All Sizes (1K/2K/4K)")
+        self.sweep_sizes_cb.setToolTip("Run every combination in each image size")
+        matrix_layout.addWidget(self.sweep_sizes_cb)
+
+        matrix_layout.addStretch()
+        settings_inner.addLayout(matrix_layout)
         settings_layout_v.addWidget(self.settings_card)
         
         left_layout.addWidget(settings_container)
@@ -162,6 +185,7 @@ class GeneratorPage(QWidget):
         # Image Drop Area
         self.drop_area = ImageDropArea()
         self.drop_area.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.drop_area.imageDropped.connect(self.on_image_added)
         img_container_layout.addWidget(self.drop_area)
         
         middle_layout.addWidget(img_container, 1)
@@ -271,6 +295,19 @@ class GeneratorPage(QWidget):
         self.gpt_size_label.setVisible(is_gpt_1_5)
         self.gpt_size_combo.setVisible(is_gpt_1_5)
 
+        self.sweep_ratios_cb.setVisible(is_banana)
+        self.sweep_sizes_cb.setVisible(is_pro)
+        self.update_matrix_options()
+
+        # Reference size limits are per model, re-prepare uploads in the background
+        for img_path in self.drop_area.image_paths:
+            ref_preprocessor.prefetch(img_path, model_name)
+
+    def update_matrix_options(self):
+        enabled = self.matrix_cb.isChecked()
+        self.sweep_ratios_cb.setEnabled(enabled)
+        self.sweep_sizes_cb.setEnabled(enabled)
+
     def update_text_formatting(self):
         self.prompt_widget.update_text_formatting()
 
@@ -318,9 +355,51 @@ class GeneratorPage(QWidget):
             "variants": variants
         }
         
+        cfg.set("prompt_matrix_enabled", self.matrix_cb.isChecked())
+        if self.matrix_cb.isChecked():
+            self.start_matrix(prompt, params, parallel_count)
+            return
+
         for _ in range(parallel_count):
             self.create_task(prompt, params)
 
+    def start_matrix(self, template, params, repeat):
+        """Expand a templated prompt and stream its jobs to the scheduler"""
+        ratios = [params["ratio"]]
+        if self.sweep_ratios_cb.isVisible() and self.sweep_ratios_cb.isChecked():
+            ratios = [self.ratio_combo.itemText(i) for i in range(self.ratio_combo.count())]
+        sizes = [params["size"]]
+        if self.sweep_sizes_cb.isVisible() and self.sweep_sizes_cb.isChecked():
+            sizes = [self.size_combo.itemText(i) for i in range(self.size_combo.count())]
+
+        max_jobs = cfg.get("matrix_max_jobs", 5000)
+        combinations = prompt_matrix.count(template, ratios, sizes, limit=max_jobs)
+        total = combinations * repeat
+        if total > max_jobs:
+            InfoBar.warning(title="Prompt Matrix", content=f"This sweep has more than {max_jobs} jobs.",
+                            parent=self, position=InfoBarPosition.TOP_RIGHT)
+            return
+
+        box = MessageBox("Start Prompt Matrix?",
+                         f"{combinations} unique combination(s) × {repeat} = {total} job(s) "
+                         f"on {params['model']}.", self.window())
+        if not box.exec():
+            return
+
+        def jobs():
+            for prompt, ratio, size in prompt_matrix.expand(template, ratios, sizes):
+                for _ in range(repeat):
+                    yield dict(params, prompt=prompt, ratio=ratio, size=size)
+
+        self.task_counter += 1
+        run_widget = MatrixRunWidget(self.task_counter, template, total)
+        stream = task_manager.create_stream(jobs())
+        stream.progress.connect(run_widget.update_progress)
+        stream.finished.connect(run_widget.set_finished)
+        run_widget.stop_requested.connect(stream.stop)
+        self.task_list_widget.add_task(run_widget)
+        stream.start()
+
     def create_task(self, prompt, params):
         self.task_counter += 1
         task_widget = TaskWidget(self.task_counter, prompt, params)
@@ -331,6 +410,31 @@ class GeneratorPage(QWidget):
         self.task_list_widget.add_task(task_widget)
         self.start_worker(task_widget)
 
+    def resume_unfinished(self):
+        """Look for tasks the previous session left running; results arrive via add_recovered_tasks"""
+        task_manager.bridge.recovered.connect(self.add_recovered_tasks)
+        task_manager.recover_unfinished()
+
+    def add_recovered_tasks(self, records):
+        # Oldest first so the list keeps submission order
+        for record in reversed(records):
+            params = {
+                "model": record.get("model"),
+                "ratio": record.get("aspect_ratio") or "auto",
+                "size": record.get("image_size") or "1K",
+                "ref_urls": [p for p in (record.get("ref_images") or []) if os.path.isfile(p)],
+                "variants": 1
+            }
+            self.task_counter += 1
+            task_widget = TaskWidget(self.task_counter, record.get("prompt", ""), params)
+            task_widget.auto_retry = self.auto_retry_cb.isChecked()
+            task_widget.mark_recovered(record["id"], PRIORITY_BACKGROUND)
+            task_widget.retry_requested.connect(self.retry_task)
+            task_widget.regenerate_requested.connect(self.regenerate_task)
+
+            self.task_list_widget.add_task(task_widget)
+            self.start_worker(task_widget)
+
     def start_worker(self, task_widget):
         try:
             variants = task_widget.params.get("variants", 1)
@@ -340,30 +444,37 @@ class GeneratorPage(QWidget):
                 task_widget.params["ratio"], 
                 task_widget.params["size"], 
                 task_widget.params["ref_urls"],
-                variants=variants
+                variants=variants,
+                task_id=task_widget.resume_task_id,
+                priority=task_widget.priority
             )
             
             task_widget.progress_ring.show()
             task_widget.progress_ring.setValue(0)
-            task_widget.status_label.setText(f"Attempt {task_widget.attempt_count + 1}: Starting...")
+            if not task_widget.recovered or task_widget.attempt_count:
+                task_widget.status_label.setText(f"Attempt {task_widget.attempt_count + 1}: Queued")
             
+            worker.queued_signal.connect(task_widget.set_queued)
+            worker.started_signal.connect(task_widget.set_started)
             worker.progress_signal.connect(task_widget.update_progress)
-            worker.finished_signal.connect(lambda s, r, m: self.on_worker_finished(task_widget, s, r, m))
-            worker.finished.connect(lambda: self.cleanup_worker(task_widget))
+            worker.finished_signal.connect(lambda s, r, m: self.on_worker_finished(task_widget, s, r, m, worker))
+            worker.finished.connect(lambda: self.cleanup_worker(task_widget, worker))
             
             task_manager.register_worker(task_widget, worker)
             worker.start()
         except Exception as e:
             print(f"[GeneratorPage] Error in start_worker: {e}")
 
-    def on_worker_finished(self, task_widget, success, result, msg):
+    def on_worker_finished(self, task_widget, success, result, msg, worker=None):
         if success:
             task_widget.set_success(result)
+        elif worker is not None:
+            task_widget.set_failed(msg, worker.job.failure_class, worker.task_id)
         else:
             task_widget.set_failed(msg)
 
-    def cleanup_worker(self, task_widget):
-        task_manager.unregister_worker(task_widget)
+    def cleanup_worker(self, task_widget, worker=None):
+        task_manager.unregister_worker(task_widget, worker)
 
     def retry_task(self, task_widget):
         self.start_worker(task_widget)
@@ -371,6 +482,10 @@ class GeneratorPage(QWidget):
     def regenerate_task(self, task_widget):
         self.create_task(task_widget.prompt, task_widget.params.copy())
     
+    def on_image_added(self, path):
+        if path:
+            ref_preprocessor.prefetch(path, self.model_combo.currentText())
+
     def on_image_paste(self):
         self.drop_area.paste_from_clipboard()
     
@@ -1,12 +1,13 @@
 import os
-from PySide6.QtCore import Qt, QSize, Signal, QUrl
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QScrollArea, QFrame, QDialog, QTextBrowser
-from PySide6.QtGui import QPixmap, QDesktopServices, QIcon, QFontMetrics, QImageReader
-from qfluentwidgets import (CardWidget, StrongBodyLabel, BodyLabel, CaptionLabel, 
-                            TransparentPushButton, FluentIcon, ImageLabel, ScrollArea, MessageBoxBase, SubtitleLabel)
+from datetime import datetime, timedelta
+from PySide6.QtCore import Qt, QUrl, QTimer
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QListView, QAbstractItemView, QTextBrowser
+from PySide6.QtGui import QDesktopServices
+from qfluentwidgets import (BodyLabel, CaptionLabel, TransparentPushButton, FluentIcon, MessageBoxBase,
+                            SubtitleLabel, SearchLineEdit, ComboBox, SmoothScrollDelegate)
 
-from core.history_manager import history_mgr
 from core.config import cfg
+from ui.components.history_list import HistoryListModel, HistoryItemDelegate
 
 class TaskDetailsDialog(MessageBoxBase):
     def __init__(self, task_data, parent=None):
@@ -91,229 +92,143 @@ class TaskDetailsDialog(MessageBoxBase):
         self.widget.setMinimumWidth(600)
         self.widget.setMinimumHeight(500)
 
-class ClickableLabel(QLabel):
-    clicked = Signal()
-    def mousePressEvent(self, event):
-        self.clicked.emit()
-
-class HistoryItem(CardWidget):
-    regenerateRequested = Signal(dict)
-
-    def __init__(self, task_data, parent=None):
-        super().__init__(parent)
-        self.task_data = task_data
-        self.setFixedHeight(120)
-        
-        layout = QHBoxLayout(self)
-        layout.setContentsMargins(16, 16, 16, 16)
-        
-        # Thumbnail - Use standard QLabel to ensure fixed size works reliably
-        self.thumb = QLabel()
-        self.thumb.setFixedSize(88, 88)
-        self.thumb.setStyleSheet("background-color: #eee; border-radius: 8px; border: 1px solid #ddd;")
-        self.thumb.setScaledContents(True)
-        
-        if task_data["status"] == "succeeded" and task_data["result_path"] and os.path.exists(task_data["result_path"]):
-            # Optimized loading using QImageReader
-            reader = QImageReader(task_data["result_path"])
-            # Scale to a reasonable thumbnail size (e.g. 2x for high DPI)
-            reader.setScaledSize(QSize(176, 176))
-            image = reader.read()
-            
-            if not image.isNull():
-                self.thumb.setPixmap(QPixmap.fromImage(image))
-            
-            self.thumb.setCursor(Qt.PointingHandCursor)
-            self.thumb.mousePressEvent = self.on_thumb_click
-        else:
-            self.thumb.setText("No Image")
-            self.thumb.setAlignment(Qt.AlignCenter)
-            
-        layout.addWidget(self.thumb)
-        
-        # Info
-        info_layout = QVBoxLayout()
-        info_layout.setSpacing(4)
-        
-        # Prompt Label - Clickable and Elided
-        self.prompt_label = ClickableLabel()
-        self.prompt_label.setCursor(Qt.PointingHandCursor)
-        self.prompt_label.clicked.connect(self.show_details)
-        
-        # Elide text
-        font = StrongBodyLabel().font()
-        self.prompt_label.setFont(font)
-        metrics = QFontMetrics(font)
-        elided_text = metrics.elidedText(task_data["prompt"], Qt.ElideRight, 400) # Approx width
-        self.prompt_label.setText(elided_text)
-        # Tooltip for quick view
-        self.prompt_label.setToolTip("Click to view full details")
-        
-        info_layout.addWidget(self.prompt_label)
-        info_layout.addWidget(BodyLabel(f"Model: {task_data['model']} | Size: {task_data['image_size']}"))
-        info_layout.addWidget(CaptionLabel(task_data["created_at"]))
-        
-        layout.addLayout(info_layout)
-        layout.addStretch()
-        
-        # Status
-        status_layout = QVBoxLayout()
-        status_layout.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
-        
-        status_text = task_data["status"].capitalize()
-        status_label = StrongBodyLabel(status_text)
-        if task_data["status"] == "succeeded":
-            status_label.setStyleSheet("color: green;")
-        elif task_data["status"] == "failed":
-            status_label.setStyleSheet("color: red;")
-        else:
-            status_label.setStyleSheet("color: orange;")
-            
-        status_layout.addWidget(status_label)
-        
-        # Buttons Layout
-        btn_layout = QHBoxLayout()
-        btn_layout.setSpacing(5)
-        
-        # Regenerate Button
-        regen_btn = TransparentPushButton(FluentIcon.SYNC, "Regenerate")
-        regen_btn.setToolTip("Run this task again")
-        regen_btn.clicked.connect(self.on_regenerate)
-        btn_layout.addWidget(regen_btn)
-
-        if task_data["status"] == "succeeded" and task_data["result_path"]:
-            open_btn = TransparentPushButton(FluentIcon.FOLDER, "Open Folder")
-            open_btn.clicked.connect(self.open_folder)
-            btn_layout.addWidget(open_btn)
-            
-        status_layout.addLayout(btn_layout)
-        layout.addLayout(status_layout)
-
-    def on_regenerate(self):
-        self.regenerateRequested.emit(self.task_data)
-
-    def show_details(self):
-        w = TaskDetailsDialog(self.task_data, self.window())
-        w.exec_()
-
-    def on_thumb_click(self, event):
-        if self.task_data["result_path"] and os.path.exists(self.task_data["result_path"]):
-            # Open with system default viewer
-            QDesktopServices.openUrl(QUrl.fromLocalFile(self.task_data["result_path"]))
-
-    def open_folder(self):
-        if self.task_data["result_path"]:
-            folder = os.path.dirname(self.task_data["result_path"])
-            QDesktopServices.openUrl(QUrl.fromLocalFile(folder))
-            
-from PySide6.QtCore import QUrl
+HISTORY_MODELS = ["nano-banana-fast", "nano-banana", "nano-banana-pro", "nano-banana-pro-vt",
+                  "gpt-image-1.5", "sora-image"]
+HISTORY_STATUSES = ["running", "succeeded", "failed"]
+# Label -> days back from now (None = no lower bound, 0 = since midnight)
+DATE_RANGES = {"Any time": None, "Today": 0, "Last 7 days": 7, "Last 30 days": 30, "Last year": 365}
 
 class HistoryPage(QWidget):
     def __init__(self):
         super().__init__()
         self.setObjectName("HistoryPage")
-        self.current_page = 1
-        self.items_per_page = cfg.get("history_items_per_page", 5)
+        self.model = HistoryListModel(cfg.get("history_fetch_batch", 100), self)
+        self.model.totalChanged.connect(self.update_count)
+        self.loaded = False
         self.initUI()
 
     def initUI(self):
         layout = QVBoxLayout(self)
         layout.setContentsMargins(0, 0, 0, 0)
         
-        # Top bar with Refresh
+        # Top bar with search, filters and Refresh
         top_layout = QHBoxLayout()
         top_layout.setContentsMargins(20, 10, 20, 0)
-        top_layout.addStretch()
+
+        self.search_edit = SearchLineEdit()
+        self.search_edit.setPlaceholderText("Search prompts")
+        self.search_edit.setClearButtonEnabled(True)
+        # Debounce typing so every keystroke doesn't hit the store
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(self.on_filters_changed)
+        self.search_edit.textChanged.connect(lambda _: self.search_timer.start())
+        self.search_edit.searchSignal.connect(lambda _: self.on_filters_changed())
+        top_layout.addWidget(self.search_edit, 1)
+
+        self.model_filter = ComboBox()
+        self.model_filter.addItems(["All models"] + HISTORY_MODELS)
+        self.model_filter.currentIndexChanged.connect(self.on_filters_changed)
+        top_layout.addWidget(self.model_filter)
+
+        self.status_filter = ComboBox()
+        self.status_filter.addItems(["All statuses"] + [s.capitalize() for s in HISTORY_STATUSES])
+        self.status_filter.currentIndexChanged.connect(self.on_filters_changed)
+        top_layout.addWidget(self.status_filter)
+
+        self.date_filter = ComboBox()
+        self.date_filter.addItems(list(DATE_RANGES))
+        self.date_filter.currentIndexChanged.connect(self.on_filters_changed)
+        top_layout.addWidget(self.date_filter)
+
         self.refresh_btn = TransparentPushButton(FluentIcon.SYNC, "Refresh")
         self.refresh_btn.clicked.connect(self.refresh_data)
         top_layout.addWidget(self.refresh_btn)
         layout.addLayout(top_layout)
         
-        self.scroll = ScrollArea()
-        self.scroll.setWidgetResizable(True)
-        self.scroll.setStyleSheet("QScrollArea { border: none; background-color: transparent; }")
-        
-        self.container = QWidget()
-        self.container.setStyleSheet("background-color: transparent;")
-        self.vbox = QVBoxLayout(self.container)
-        self.vbox.setSpacing(10)
-        self.vbox.setAlignment(Qt.AlignTop)
-        
-        self.scroll.setWidget(self.container)
-        layout.addWidget(self.scroll)
-        
-        # Pagination
-        pagination_layout = QHBoxLayout()
-        pagination_layout.setContentsMargins(0, 10, 0, 10)
-        pagination_layout.setAlignment(Qt.AlignCenter)
-        
-        self.prev_btn = TransparentPushButton(FluentIcon.LEFT_ARROW, "Previous")
-        self.prev_btn.clicked.connect(self.prev_page)
-        
-        self.page_label = StrongBodyLabel("1 / 1")
-        
-        self.next_btn = TransparentPushButton(FluentIcon.RIGHT_ARROW, "Next")
-        self.next_btn.clicked.connect(self.next_page)
-        
-        pagination_layout.addWidget(self.prev_btn)
-        pagination_layout.addSpacing(20)
-        pagination_layout.addWidget(self.page_label)
-        pagination_layout.addSpacing(20)
-        pagination_layout.addWidget(self.next_btn)
-        
-        layout.addLayout(pagination_layout)
+        # Rows are painted by the delegate and fetched in batches while scrolling
+        self.view = QListView()
+        self.view.setModel(self.model)
+        self.delegate = HistoryItemDelegate(self.view)
+        self.view.setItemDelegate(self.delegate)
+        self.view.setUniformItemSizes(True)
+        self.view.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.view.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.view.setSelectionMode(QAbstractItemView.NoSelection)
+        self.view.setFocusPolicy(Qt.NoFocus)
+        self.view.setMouseTracking(True)
+        self.view.setStyleSheet("QListView { border: none; background-color: transparent; }")
+        self.scroll_delegate = SmoothScrollDelegate(self.view)
+        self.delegate.detailsRequested.connect(self.show_details)
+        self.delegate.imageRequested.connect(self.open_image)
+        self.delegate.regenerateRequested.connect(self.on_regenerate_requested)
+        self.delegate.folderRequested.connect(self.open_folder)
+        layout.addWidget(self.view)
+
+        self.empty_label = BodyLabel("No history yet.")
+        self.empty_label.setAlignment(Qt.AlignCenter)
+        self.empty_label.hide()
+        layout.addWidget(self.empty_label, 1)
+
+        self.count_label = CaptionLabel()
+        self.count_label.setAlignment(Qt.AlignCenter)
+        self.count_label.setContentsMargins(0, 10, 0, 10)
+        layout.addWidget(self.count_label)
         
     def showEvent(self, event):
-        self.load_history()
+        # Later changes arrive through the model, so only the first show loads
+        if not self.loaded:
+            self.loaded = True
+            self.load_history()
         super().showEvent(event)
 
     def refresh_data(self):
-        self.current_page = 1
         self.load_history()
 
-    def prev_page(self):
-        if self.current_page > 1:
-            self.current_page -= 1
-            self.load_history()
-
-    def next_page(self):
-        self.current_page += 1
+    def on_filters_changed(self, *args):
+        self.search_timer.stop()
         self.load_history()
 
+    def current_filters(self):
+        """Filter kwargs for history_mgr.get_tasks/count_tasks from the top bar"""
+        filters = {"text": self.search_edit.text().strip() or None}
+        model_idx = self.model_filter.currentIndex()
+        filters["model"] = HISTORY_MODELS[model_idx - 1] if model_idx > 0 else None
+        status_idx = self.status_filter.currentIndex()
+        filters["status"] = HISTORY_STATUSES[status_idx - 1] if status_idx > 0 else None
+        days = DATE_RANGES.get(self.date_filter.currentText())
+        if days is not None:
+            start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days)
+            filters["date_from"] = start.strftime("%Y-%m-%d %H:%M:%S")
+        return filters
+
     def load_history(self):
-        # Clear existing
-        for i in range(self.vbox.count()):
-            item = self.vbox.itemAt(i)
-            if item.widget():
-                item.widget().deleteLater()
-                
-        all_tasks = history_mgr.get_all_tasks()
-        total_items = len(all_tasks)
-        total_pages = (total_items + self.items_per_page - 1) // self.items_per_page
-        if total_pages == 0: total_pages = 1
-        
-        if self.current_page > total_pages:
-            self.current_page = total_pages
-        if self.current_page < 1:
-            self.current_page = 1
-            
-        start_idx = (self.current_page - 1) * self.items_per_page
-        end_idx = min(start_idx + self.items_per_page, total_items)
-        
-        current_tasks = all_tasks[start_idx:end_idx]
-        
-        if not current_tasks:
-            self.vbox.addWidget(BodyLabel("No history yet."))
-        else:
-            for task in current_tasks:
-                item = HistoryItem(task)
-                item.regenerateRequested.connect(self.on_regenerate_requested)
-                self.vbox.addWidget(item)
-        
-        # Update Pagination Controls
-        self.page_label.setText(f"{self.current_page} / {total_pages}")
-        self.prev_btn.setEnabled(self.current_page > 1)
-        self.next_btn.setEnabled(self.current_page < total_pages)
+        filters = self.current_filters()
+        self.model.reload(filters)
+        self.view.scrollToTop()
+
+    def update_count(self, total):
+        if total == 0:
+            filtered = any(v is not None for v in self.model.filters.values())
+            self.empty_label.setText("No matching tasks." if filtered else "No history yet.")
+        self.empty_label.setVisible(total == 0)
+        self.view.setVisible(total > 0)
+        self.count_label.setText(f"{total} task{'s' if total != 1 else ''}")
+
+    def show_details(self, task_data):
+        w = TaskDetailsDialog(task_data, self.window())
+        w.exec_()
+
+    def open_image(self, task_data):
+        if task_data["result_path"] and os.path.exists(task_data["result_path"]):
+            # Open with system default viewer
+            QDesktopServices.openUrl(QUrl.fromLocalFile(task_data["result_path"]))
+
+    def open_folder(self, task_data):
+        if task_data["result_path"]:
+            folder = os.path.dirname(task_data["result_path"])
+            QDesktopServices.openUrl(QUrl.fromLocalFile(folder))
 
     def on_regenerate_requested(self, task_data):
         # Signal up to main window
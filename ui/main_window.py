@@ -1,3 +1,4 @@
+from PySide6.QtCore import QTimer
 from PySide6.QtGui import QIcon
 from PySide6.QtWidgets import QApplication
 from qfluentwidgets import FluentWindow, NavigationItemPosition, FluentIcon, SplashScreen, setTheme, Theme, qconfig
@@ -7,6 +8,7 @@ from ui.history_page import HistoryPage
 from ui.settings_page import SettingsPage
 from core.config import cfg
 from core.task_manager import task_manager
+from core.history_manager import history_mgr
 
 class MainWindow(FluentWindow):
     def __init__(self):
@@ -27,6 +29,8 @@ class MainWindow(FluentWindow):
         self.settings_interface = SettingsPage()
 
         self.initNavigation()
+        # Resume tasks a previous session left running once the window is up
+        QTimer.singleShot(0, self.generator_interface.resume_unfinished)
         # self.splashScreen.finish()
 
     def initWindow(self):
@@ -67,6 +71,9 @@ class MainWindow(FluentWindow):
         print("[MainWindow] Application closing, stopping all workers...")
         task_manager.stop_all_workers()
         self.generator_interface.stop_all_workers()
+        # Write out anything still waiting in the write-behind buffers
+        history_mgr.flush()
+        cfg.flush()
         super().closeEvent(event)
 
     def regenerate_task(self, task_data):
@@ -47,18 +47,18 @@ class SettingsPage(ScrollArea):
         
         self.general_group.addSettingCard(self.retries_card)
         
-        # History Items Per Page
+        # History Fetch Batch
         self.history_items_card = SettingCard(
             FluentIcon.HISTORY,
-            "History Items Per Page",
-            "Number of items displayed per page in history (1-100)",
+            "History Load Batch",
+            "Number of history records loaded at a time while scrolling (10-500)",
             self.general_group
         )
         
-        self.history_items_label = QLabel(str(cfg.get("history_items_per_page", 5)), self.history_items_card)
+        self.history_items_label = QLabel(str(cfg.get("history_fetch_batch", 100)), self.history_items_card)
         self.history_items_slider = Slider(Qt.Horizontal, self.history_items_card)
-        self.history_items_slider.setRange(1, 100)
-        self.history_items_slider.setValue(cfg.get("history_items_per_page", 5))
+        self.history_items_slider.setRange(10, 500)
+        self.history_items_slider.setValue(cfg.get("history_fetch_batch", 100))
         
         self.history_items_slider.valueChanged.connect(lambda v: self.history_items_label.setText(str(v)))
         
@@ -68,6 +68,16 @@ class SettingsPage(ScrollArea):
         self.history_items_card.hBoxLayout.addSpacing(16)
         
         self.general_group.addSettingCard(self.history_items_card)
+
+        # Reference image preprocessing
+        self.ref_preprocess_switch = SwitchSettingCard(
+            FluentIcon.PHOTO,
+            "Shrink Reference Images",
+            "Downscale and re-encode large reference images before upload (needs Pillow)",
+            parent=self.general_group
+        )
+        self.ref_preprocess_switch.setChecked(cfg.get("ref_preprocess_enabled", False))
+        self.general_group.addSettingCard(self.ref_preprocess_switch)
         self.layout.addWidget(self.general_group)
 
         # Text Format Settings
@@ -216,7 +226,8 @@ class SettingsPage(ScrollArea):
         cfg.set("api_base_url", url)
         cfg.set("api_key", key)
         cfg.set("max_retries", self.retries_slider.value())
-        cfg.set("history_items_per_page", self.history_items_slider.value())
+        cfg.set("history_fetch_batch", self.history_items_slider.value())
+        cfg.set("ref_preprocess_enabled", self.ref_preprocess_switch.isChecked())
         cfg.set("text_format_enabled", self.format_switch.isChecked())
         cfg.set("text_font_size", self.font_size_slider.value())
         cfg.set("text_font_family", self.font_family_combo.currentText())